@@ -0,0 +1,22 @@
+"""
+ASGI config for git transport endpoints of djacket project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+which serves only git smart http requests ('info/refs', 'git-upload-pack' and
+'git-receive-pack') on an asyncio event loop. Other requests are served by the
+WSGI application.
+
+e.g.
+    uvicorn djacket.asgi:application --host 0.0.0.0 --port 8081
+"""
+
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djacket.settings")
+django.setup()
+
+from git.aio import GitASGIApplication
+
+application = GitASGIApplication()
@@ -135,6 +135,33 @@ if not DEBUG:
     }
 
 
+# Cache for keeping results of expensive git operations.
+#   Results are keyed by immutable git objects (e.g. commit hashes) so they can live long.
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'djacket',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000
+        }
+    },
+    # Rendered READMEs can be as large as GIT_BLOB_PREVIEW_SIZE, so only a few of them are kept per worker.
+    'readme': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'djacket-readme',
+        'OPTIONS': {
+            'MAX_ENTRIES': 64
+        }
+    }
+}
+
+GIT_HISTORY_CACHE_TIMEOUT = 24 * 60 * 60
+GIT_INFO_REFS_CACHE_TIMEOUT = 60 * 60   # refs advertisements are validated by refs state on each request too.
+GIT_AUTH_CACHE_TIMEOUT = 5 * 60         # verified git http credentials, checked against user's password hash on each hit.
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
 
@@ -199,3 +226,39 @@ ALLOWED_HOSTS = ['*'] if DEBUG else ast.literal_eval(osenv('DALWD_HSTS'))
 #   This is where all the repos will be stored and maintained.
 
 GIT_DEPOSIT_ROOT = os.path.join(BASE_DIR, '/deposit/') if IS_CI else '/srv/deposit/'
+
+
+# Long-lived 'git cat-file' processes used for reading git objects are pooled in each worker.
+#   Pool size is the maximum number of processes kept and idle timeout is in seconds.
+
+GIT_CATFILE_POOL_SIZE = 32
+GIT_CATFILE_IDLE_TIMEOUT = 300
+
+
+# Blob pages only show this many first bytes of a file, whole content is served by it's 'raw' url.
+
+GIT_BLOB_PREVIEW_SIZE = 512 * 1024
+
+
+# Responses of 'git-upload-pack' to repeated identical requests (e.g. clones) are cached on disk.
+#   Cache is limited to GIT_PACK_CACHE_MAX_SIZE bytes by removing least recently used responses and
+#   responses larger than GIT_PACK_CACHE_MAX_ENTRY_SIZE bytes are not cached. Set root to None to disable it.
+#   In production cached responses are sent by nginx, redirected to it's internal GIT_PACK_CACHE_REDIRECT location.
+
+GIT_PACK_CACHE_ROOT = os.path.join(BASE_DIR, '..', 'cache', 'packs', '') if IS_CI else '/srv/cache/packs/'
+GIT_PACK_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+GIT_PACK_CACHE_MAX_ENTRY_SIZE = 512 * 1024 * 1024
+GIT_PACK_CACHE_REDIRECT = None if DEBUG else '/_packcache/'
+
+
+# Repositories are maintained (repacked and their commit-graph written) in background by
+#   'manage.py maintain_repositories' worker, which checks them every GIT_MAINTENANCE_INTERVAL seconds.
+#   A repository is due after GIT_MAINTENANCE_PUSHES pushes, or GIT_MAINTENANCE_MAX_AGE seconds after
+#   it's last maintenance if it has been pushed to since. Repositories with more than GIT_MAINTENANCE_MAX_PACKS
+#   packfiles are fully repacked with a bitmap index. At most GIT_MAINTENANCE_MAX_JOBS run concurrently.
+
+GIT_MAINTENANCE_INTERVAL = 10 * 60
+GIT_MAINTENANCE_PUSHES = 10
+GIT_MAINTENANCE_MAX_AGE = 24 * 60 * 60
+GIT_MAINTENANCE_MAX_PACKS = 16
+GIT_MAINTENANCE_MAX_JOBS = 2
@@ -0,0 +1,316 @@
+import os
+import re
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from django.db import close_old_connections
+
+from git import packcache
+from git.repo import Repo
+from git.action import GIT_ACTION_ADVERTISEMENT, GIT_ACTION_RESULT
+from git.decorators import GIT_ACCESS_GRANTED, GIT_ACCESS_UNAUTHORIZED, GIT_ACCESS_FORBIDDEN, get_git_access
+from git.http import GIT_HTTP_BODY_CHUNK_SIZE, GIT_HTTP_GZIP_ENCODINGS, GitResponse, send_post_receive_signal, \
+                            get_body_decompressor, decompress_body_chunk
+from git.service import GIT_SERVICE_RECEIVE_PACK, GIT_SERVICE_UPLOAD_PACK, is_valid_git_service, parse_git_protocol
+from repository.models import Repository
+
+GIT_ASGI_PATH_PATTERN = re.compile(r'^/(?P<username>\w+)/(?P<repository>[-\w]+)\.git/'
+                                    r'(?P<endpoint>info/refs|git-upload-pack|git-receive-pack)$')
+GIT_ASGI_INFO_REFS = 'info/refs'
+
+logger = logging.getLogger('django')
+
+
+class GitASGIApplication:
+    """
+        ASGI application serving git smart http endpoints ('info/refs', 'git-upload-pack' and
+            'git-receive-pack') on an asyncio event loop. Git services are driven as asyncio
+            subprocesses and request and response bodies are streamed between them and clients,
+            so a slow client only holds a few buffers instead of a whole worker and a single
+            process can serve hundreds of concurrent transfers.
+        Blocking work (database queries, password checks and cached refs advertisements) is run
+            in event loop's thread pool, with same access rules as Django git views.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        match = GIT_ASGI_PATH_PATTERN.match(scope['path'])
+        if match is None:
+            return await self.respond(send, 404, b'Not found.')
+
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        endpoint = match.group('endpoint')
+        if endpoint == GIT_ASGI_INFO_REFS:
+            method, service = 'GET', parse_qs(scope['query_string'].decode('latin-1')).get('service', [None])[0]
+        else:
+            method, service = 'POST', endpoint
+
+        if scope['method'] != method:
+            return await self.respond(send, 405, b'Method not allowed.')
+        if not is_valid_git_service(service):
+            return await self.respond(send, 404, b'Not found.')
+
+        access = await self.run_sync(self.get_access, match.group('username'), match.group('repository'),
+                                        service, headers.get('authorization'))
+        if access == GIT_ACCESS_UNAUTHORIZED:
+            return await self.respond(send, 401, b'', [(b'www-authenticate', b'Basic')])
+        elif access == GIT_ACCESS_FORBIDDEN:
+            return await self.respond(send, 403, b'Access forbidden.')
+        elif access != GIT_ACCESS_GRANTED:
+            return await self.respond(send, 404, b'Not found.')
+
+        repo = Repo(Repo.get_repository_location(match.group('username'), match.group('repository')))
+        protocol = parse_git_protocol(headers.get('git-protocol'))
+        if endpoint == GIT_ASGI_INFO_REFS:
+            await self.info_refs(send, repo, service, protocol)
+        else:
+            gzipped = headers.get('content-encoding', '').lower() in GIT_HTTP_GZIP_ENCODINGS
+            await self.service_rpc(receive, send, repo, service, protocol, gzipped)
+
+
+    async def lifespan(self, receive, send):
+        """
+            Answers server's startup and shutdown events.
+        """
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+    async def run_sync(self, func, *args):
+        """
+            Runs a blocking function in event loop's thread pool and returns it's result.
+                Database connections of thread are handled just like they are for a Django request.
+        """
+
+        def _run():
+            close_old_connections()
+            try:
+                return func(*args)
+            finally:
+                close_old_connections()
+
+        return await asyncio.get_event_loop().run_in_executor(None, _run)
+
+
+    async def run_in_thread(self, func, *args):
+        """
+            Runs a blocking function which doesn't touch database (e.g. disk I/O) in event loop's
+                thread pool and returns it's result.
+        """
+
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+    async def respond(self, send, status, body, headers=None):
+        """
+            Sends a complete response with the given status, body and headers.
+        """
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers or []})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+    def get_access(self, username, repository, service, authorization):
+        """
+            Returns access result of a git request to the given repository (None if it doesn't exist).
+        """
+
+        try:
+            repo = Repository.objects.get_by_owner(username, repository)
+        except Repository.DoesNotExist:
+            return None
+        return get_git_access(repo, service, authorization)
+
+
+    def get_response_headers(self, response):
+        """
+            Returns headers of the given Django response in ASGI format.
+        """
+
+        return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.items()]
+
+
+    async def info_refs(self, send, repo, service, protocol):
+        """
+            Responds to '/info/refs' requests. Advertisements are built by GitResponse (and cached
+                by repository), so they're identical to the ones of Django git views.
+        """
+
+        def _get_response():
+            return GitResponse(service=service, action=GIT_ACTION_ADVERTISEMENT, repository=repo,
+                                data=None, protocol=protocol).get_http_info_refs()
+
+        response = await self.run_sync(_get_response)
+        if response is None:
+            return await self.respond(send, 404, b'Not found.')
+        await self.respond(send, response.status_code, response.content, self.get_response_headers(response))
+
+
+    async def service_rpc(self, receive, send, repo, service, protocol, gzipped):
+        """
+            Responds to 'git-upload-pack' and 'git-receive-pack' requests by streaming request body
+                into git service and it's output back to client. If client disconnects git is killed.
+            Cacheable 'git-upload-pack' requests (e.g. clones) are answered from cache if possible,
+                otherwise their response is cached while it's streamed.
+        """
+
+        decompressor = get_body_decompressor() if gzipped else None
+        head, finished, key, fingerprint = [], False, None, None
+        if service == GIT_SERVICE_UPLOAD_PACK and packcache.is_enabled():
+            head, finished = await self.receive_head(receive, decompressor)
+            if head is None:    # client has disconnected.
+                return
+            if finished:
+                key, fingerprint = await self.run_sync(packcache.get_key, repo, protocol, b''.join(head))
+                cached = await self.run_sync(packcache.lookup, key)
+                if cached is not None and await self.send_cached(send, service, cached):
+                    return
+
+        refs_fingerprint = None
+        if service == GIT_SERVICE_RECEIVE_PACK:
+            refs_fingerprint = await self.run_in_thread(repo.get_refs_fingerprint)
+
+        env = dict(os.environ)
+        env.update(Repo.get_protocol_env(protocol) or {})
+        process = await asyncio.create_subprocess_exec('git', service[len('git-'):], '--stateless-rpc', repo.location,
+                        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE, env=env)
+        errors = asyncio.ensure_future(process.stderr.read())
+        feeder = asyncio.ensure_future(self.feed_request(receive, process, decompressor, head, finished))
+        entry = None if key is None else await self.run_in_thread(packcache.open_entry, key)
+
+        response = GitResponse(service=service, action=GIT_ACTION_RESULT)
+        response.set_response_header()
+        completed = False
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': self.get_response_headers(response)})
+            while True:
+                chunk = await process.stdout.read(GIT_HTTP_BODY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if entry is not None and not await self.run_in_thread(packcache.write_entry, entry, chunk):
+                    entry = None
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            completed = True
+        finally:
+            if not completed and process.returncode is None:
+                process.kill()
+            await process.wait()
+            feeder.cancel()
+            stderr = await errors
+            if stderr != b'':
+                logger.info('GIT_ASGI -> ERR ({})'.format(stderr))
+            if entry is not None and completed and process.returncode == 0:
+                await self.run_sync(packcache.commit_entry, repo, key, fingerprint, entry)
+            elif entry is not None:
+                await self.run_in_thread(packcache.discard_entry, entry)
+
+        if completed and process.returncode == 0 and service == GIT_SERVICE_RECEIVE_PACK:
+            await self.run_sync(send_post_receive_signal, self.__class__, repo, refs_fingerprint)
+
+
+    async def send_cached(self, send, service, cached):
+        """
+            Sends a cached 'git-upload-pack' response, either by redirecting web server to it or by reading it.
+                Returns false if response is gone in the meantime (e.g. it's evicted), then nothing is sent.
+        """
+
+        response = GitResponse(service=service, action=GIT_ACTION_RESULT)
+        response.set_response_header()
+        redirect = await self.run_in_thread(packcache.get_redirect, cached)
+        if redirect is not None:
+            response['X-Accel-Redirect'] = redirect
+            await self.respond(send, 200, b'', self.get_response_headers(response))
+            return True
+
+        cached_file = await self.run_in_thread(packcache.open_cached, cached)
+        if cached_file is None:
+            return False
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': self.get_response_headers(response)})
+        with cached_file:
+            while True:
+                chunk = await self.run_in_thread(cached_file.read, GIT_HTTP_BODY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+        return True
+
+
+    async def receive_head(self, receive, decompressor):
+        """
+            Receives (and decompresses) beginning of request body up to GIT_PACK_CACHE_MAX_REQUEST_SIZE bytes.
+                Returns received chunks and whether body is finished, or (None, True) if client has disconnected.
+        """
+
+        head, size = [], 0
+        while size <= packcache.GIT_PACK_CACHE_MAX_REQUEST_SIZE:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None, True
+            last = not message.get('more_body', False)
+            for chunk in self.decompress(decompressor, message.get('body', b''), last):
+                head.append(chunk)
+                size = size + len(chunk)
+            if last:
+                return head, True
+        return head, False
+
+
+    async def feed_request(self, receive, process, decompressor, head, finished):
+        """
+            Writes request body to git process input as it's received, decompressing gzip encoded
+                bodies on the fly. 'head' is the already received beginning of body and 'finished'
+                tells if it's the whole body. Afterwards waits for client to disconnect, to kill git
+                if it's still running (e.g. client is gone in the middle of a clone).
+        """
+
+        message = {'type': 'http.request'}
+        try:
+            for chunk in head:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+            while not finished:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    break
+                finished = not message.get('more_body', False)
+                for chunk in self.decompress(decompressor, message.get('body', b''), finished):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):    # git exited before consuming all of it's input.
+            pass
+        finally:
+            process.stdin.close()
+
+        while message['type'] != 'http.disconnect':
+            message = await receive()
+        if process.returncode is None:
+            process.kill()
+
+
+    def decompress(self, decompressor, chunk, last):
+        """
+            Yields the given chunk, decompressed if there's a decompressor (just like WSGI requests,
+                see 'git.http.decompress_body_chunk'). Decompressor is flushed on 'last' chunk of body.
+        """
+
+        if decompressor is None:
+            if chunk:
+                yield chunk
+        else:
+            for output in decompress_body_chunk(decompressor, chunk, last):
+                yield output
@@ -0,0 +1,206 @@
+import os
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from subprocess import DEVNULL, PIPE, Popen
+
+from django.conf import settings
+
+GIT_CATFILE_BATCH = '--batch'
+GIT_CATFILE_BATCH_CHECK = '--batch-check'
+GIT_CATFILE_MODES = [GIT_CATFILE_BATCH, GIT_CATFILE_BATCH_CHECK]
+GIT_CATFILE_MISSING_SUFFIXES = (' missing', ' ambiguous')
+
+
+class GitCatFile:
+    """
+        A long-lived 'git cat-file' process for a repository, running either in '--batch' mode
+            (object contents) or '--batch-check' mode (object information only).
+        Object names (e.g. 'HEAD:path/to/file' or a SHA-1 hash) are written to process input
+            one per line and their header (and contents) are read back from it's output.
+    """
+
+    def __init__(self, location, mode):
+        if not mode in GIT_CATFILE_MODES: raise ValueError('Entered cat-file mode is not valid')
+
+        self.location = location
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.process = None
+
+
+    def _start(self):
+        """
+            Starts 'git cat-file' process for repository.
+        """
+
+        self.process = Popen(['git', 'cat-file', self.mode], stdin=PIPE, stdout=PIPE, stderr=DEVNULL, cwd=self.location)
+
+
+    def _request(self, name):
+        """
+            Writes an object name to process and returns it's parsed header line
+                as (sha1_hash, kind, size) or None if object is missing.
+        """
+
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+
+        self.process.stdin.write(name.encode('utf-8') + b'\n')
+        self.process.stdin.flush()
+
+        header = self.process.stdout.readline()
+        if header == b'':
+            raise BrokenPipeError('git cat-file exited unexpectedly')
+
+        header = header.decode('utf-8', 'replace').rstrip('\n')
+        if header.endswith(GIT_CATFILE_MISSING_SUFFIXES):  # names may contain spaces, e.g. 'HEAD:a b missing'.
+            return None
+        sha1_hash, kind, size = header.rsplit(' ', 2)
+        return sha1_hash, kind, int(size)
+
+
+    def _query(self, name):
+        """
+            Queries an object and returns (sha1_hash, kind, size, content) for it or None if it's missing.
+                Content is always None in '--batch-check' mode.
+        """
+
+        header = self._request(name)
+        if header is None:
+            return None
+
+        sha1_hash, kind, size = header
+        content = None
+        if self.mode == GIT_CATFILE_BATCH:
+            content = self.process.stdout.read(size + 1)[:-1]  # contents are followed by a newline.
+            if len(content) != size:
+                raise BrokenPipeError('git cat-file exited unexpectedly')
+        return sha1_hash, kind, size, content
+
+
+    def query(self, name):
+        """
+            Thread-safe query of an object by it's name. If process has died in the middle
+                of the request, it's restarted once.
+        """
+
+        if '\n' in name: raise ValueError('Object name should not contain newlines')
+
+        with self.lock:
+            self.last_used = time.monotonic()
+            try:
+                return self._query(name)
+            except BrokenPipeError:
+                self.close(locked=True)
+                return self._query(name)
+            except ValueError:  # an unexpected header, process output can't be followed anymore.
+                self.close(locked=True)
+                raise
+
+
+    def close(self, locked=False):
+        """
+            Terminates 'git cat-file' process.
+        """
+
+        if not locked:
+            with self.lock:
+                return self.close(locked=True)
+
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=1)
+            except BaseException:
+                self.process.kill()
+            finally:
+                self.process.stdout.close()
+            self.process = None
+
+
+    def __str__(self):
+        """
+            Returns a string representation of cat-file's object.
+        """
+
+        return 'git cat-file {0} for {1}'.format(self.mode, self.location)
+
+
+class GitCatFilePool:
+    """
+        A per-worker pool of 'git cat-file' processes keyed by repository location and mode.
+            Pool is bounded by settings.GIT_CATFILE_POOL_SIZE and least recently used processes are
+            evicted when it's full. Processes idle for more than settings.GIT_CATFILE_IDLE_TIMEOUT
+            seconds are evicted too.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.processes = OrderedDict()
+
+
+    def _evict(self):
+        """
+            Closes idle processes and least recently used ones exceeding pool size.
+                Returns the evicted processes to be closed outside of pool lock.
+        """
+
+        now, evicted = time.monotonic(), []
+        for key, catfile in list(self.processes.items()):
+            if now - catfile.last_used > settings.GIT_CATFILE_IDLE_TIMEOUT:
+                evicted.append(self.processes.pop(key))
+        while len(self.processes) > settings.GIT_CATFILE_POOL_SIZE:
+            evicted.append(self.processes.popitem(last=False)[1])
+        return evicted
+
+
+    def get(self, location, mode):
+        """
+            Returns a 'git cat-file' process for the given repository location and mode.
+        """
+
+        with self.lock:
+            if self.pid != os.getpid():  # pool is inherited from a parent process, it's processes are not ours.
+                self.pid, self.processes = os.getpid(), OrderedDict()
+
+            key = (location, mode)
+            requested = self.processes.pop(key, None) or GitCatFile(location, mode)
+            requested.last_used = time.monotonic()
+            self.processes[key] = requested
+            evicted = self._evict()
+
+        for catfile in evicted:
+            catfile.close()
+        return requested
+
+
+    def discard(self, location):
+        """
+            Closes all processes of the given repository location, e.g. when it's removed or renamed.
+        """
+
+        with self.lock:
+            evicted = [self.processes.pop(key) for key in list(self.processes) if key[0] == location]
+
+        for catfile in evicted:
+            catfile.close()
+
+
+    def close(self):
+        """
+            Closes all processes inside pool.
+        """
+
+        with self.lock:
+            evicted, self.processes = list(self.processes.values()), OrderedDict()
+
+        for catfile in evicted:
+            catfile.close()
+
+
+catfile_pool = GitCatFilePool()
+atexit.register(catfile_pool.close)
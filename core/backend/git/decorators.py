@@ -1,12 +1,17 @@
 from functools import wraps
 
-from django.contrib.auth.models import User
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseForbidden
 
 from git.service import GIT_SERVICE_RECEIVE_PACK, GIT_SERVICE_UPLOAD_PACK
-from repository.models import Repository, RepositoryAccess
+from repository.decorators import get_requested_repo
+from repository.models import Repository
 from user.auth import base_auth
 
+# Results of checking access of a git request.
+GIT_ACCESS_GRANTED = 200
+GIT_ACCESS_UNAUTHORIZED = 401   # basic authentication is needed.
+GIT_ACCESS_FORBIDDEN = 403
+
 
 def git_access_required(func):
     """
@@ -22,37 +27,51 @@ def git_access_required(func):
     @wraps(func)
     def _decorator(request, *args, **kwargs):
         service = _parse_git_service(request.build_absolute_uri())
-        user = User.objects.get(username=kwargs['username'])
-        repo = Repository.objects.get(owner=user, name=kwargs['repository'])
-        if service == GIT_SERVICE_UPLOAD_PACK and repo.private: # private repo and doing a 'git-clone' or 'git-pull'
-            return _check_access(request, func, *args, **kwargs)
-        elif service == GIT_SERVICE_UPLOAD_PACK and not repo.private: # public repo and doing a 'git-clone' or 'git-pull'
+        try:
+            repo = get_requested_repo(request, kwargs['username'], kwargs['repository'])
+        except Repository.DoesNotExist:
+            raise Http404()
+
+        access = get_git_access(repo, service, request.META.get('HTTP_AUTHORIZATION'))
+        if access == GIT_ACCESS_GRANTED:
             return func(request, *args, **kwargs)
-        elif service == GIT_SERVICE_RECEIVE_PACK: # doing a 'git-commit'
-            return _check_access(request, func, *args, **kwargs)
+        elif access == GIT_ACCESS_FORBIDDEN:
+            return HttpResponseForbidden('Access forbidden.')
+        elif access == GIT_ACCESS_UNAUTHORIZED:
+            res = HttpResponse()
+            res.status_code = 401   # Basic authentication is needed.
+            res['WWW-Authenticate'] = 'Basic'
+            return res
     return _decorator
 
 
-def _check_access(request, func, *args, **kwargs):
+def get_git_access(repo, service, authorization):
     """
-        Checks user's authentication and access to repository.
+        Returns result of checking access to the given repository for a git service request
+            with the given 'Authorization' header value (or None if it has no such header).
+            Returns None for unknown services.
     """
 
-    if request.META.get('HTTP_AUTHORIZATION'):
-        user = base_auth(request.META['HTTP_AUTHORIZATION'])
-        if user:
-            repo = Repository.objects.get(owner=user, name=kwargs['repository'])
-            access = RepositoryAccess.objects.get(user=user, repository=repo)
-            if access:
-                return func(request, *args, **kwargs)
-            else:   # User has no access to repository.
-                return HttpResponseForbidden('Access forbidden.')
-        else:   # User is not registered on Djacket.
-            return HttpResponseForbidden('Access forbidden.')
-    res = HttpResponse()
-    res.status_code = 401   # Basic authentication is needed.
-    res['WWW-Authenticate'] = 'Basic'
-    return res
+    if service == GIT_SERVICE_UPLOAD_PACK and not repo.private: # public repo and doing a 'git-clone' or 'git-pull'
+        return GIT_ACCESS_GRANTED
+    elif service == GIT_SERVICE_UPLOAD_PACK or service == GIT_SERVICE_RECEIVE_PACK: # private repo or doing a 'git-commit'
+        return _check_access(repo, authorization)
+    else:
+        return None
+
+
+def _check_access(repo, authorization):
+    """
+        Checks user's authentication and access to the given repository.
+    """
+
+    if authorization:
+        user = base_auth(authorization)
+        if user and repo.has_access(user):
+            return GIT_ACCESS_GRANTED
+        else:   # User is not registered on Djacket or has no access to repository.
+            return GIT_ACCESS_FORBIDDEN
+    return GIT_ACCESS_UNAUTHORIZED
 
 
 def _parse_git_service(request_path):
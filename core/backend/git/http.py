@@ -1,14 +1,21 @@
+import zlib
 import logging
 
-from django.http import HttpResponse, HttpResponseNotFound
+from django.http import HttpResponse, HttpResponseNotFound, StreamingHttpResponse
 
-from git.repo import Repo
-from git.service import GIT_SERVICE_UPLOAD_PACK, GIT_SERVICE_RECEIVE_PACK
+from git import packcache
+from git.signals import post_receive
+from git.pktline import FLUSH_PKT, encode_packet
+from git.service import GIT_SERVICE_UPLOAD_PACK, GIT_SERVICE_RECEIVE_PACK, GIT_PROTOCOL_V2, \
+                            parse_git_protocol, get_git_protocol_version
 
 GIT_HTTP_INFO_REFS = 1
 GIT_HTTP_SERVICE_UPLOAD_PACK = 2
 GIT_HTTP_SERVICE_RECEIVE_PACK = 3
 
+GIT_HTTP_BODY_CHUNK_SIZE = 64 * 1024
+GIT_HTTP_GZIP_ENCODINGS = ['gzip', 'x-gzip']
+
 logger = logging.getLogger('django')
 
 
@@ -21,9 +28,95 @@ def get_http_error(exception):
         return HttpResponseNotFound()
 
 
-class GitResponse(HttpResponse):
+def send_post_receive_signal(sender, repo, refs_fingerprint):
     """
-        Git http response.
+        Sends 'post_receive' signal for the given repository after 'git receive-pack' has
+            successfully finished, if it's references have changed since 'refs_fingerprint' was
+            taken (see 'Repo.get_refs_fingerprint'). So requests which update nothing (e.g. git's
+            '0000' probe before a chunked push or a rejected push) are ignored.
+            Failures of receivers are logged and don't affect the push.
+    """
+
+    if repo.get_refs_fingerprint() == refs_fingerprint:
+        return
+
+    for receiver, response in post_receive.send_robust(sender=sender, repo=repo):
+        if isinstance(response, Exception):
+            logger.error('POST_RECEIVE -> ERR ({0}: {1})'.format(receiver.__name__, response))
+
+
+def get_request_protocol(request):
+    """
+        Returns wire protocol parameters requested by git client in 'Git-Protocol' header
+            (e.g. 'version=2') or None if there's no such (valid) header.
+    """
+
+    return parse_git_protocol(request.META.get('HTTP_GIT_PROTOCOL'))
+
+
+def read_request_body(request):
+    """
+        Returns a generator over body of a git http request in chunks of at most GIT_HTTP_BODY_CHUNK_SIZE bytes,
+            so that whole body is never held in memory. Chunked requests (which git uses for large pushes)
+            have no 'Content-Length' and are read from 'wsgi.input' until it's exhausted.
+        Gzip encoded bodies are decompressed on the fly.
+    """
+
+    if request.META.get('HTTP_TRANSFER_ENCODING', '').lower() == 'chunked':
+        stream = request.META['wsgi.input']
+    else:   # Django limits reading of request to it's 'Content-Length'.
+        stream = request
+
+    chunks = iter(lambda: stream.read(GIT_HTTP_BODY_CHUNK_SIZE), b'')
+    if request.META.get('HTTP_CONTENT_ENCODING', '').lower() in GIT_HTTP_GZIP_ENCODINGS:
+        return _decompress_body(chunks)
+    else:
+        return chunks
+
+
+def _decompress_body(chunks):
+    """
+        Decompresses the given gzip encoded chunks while keeping each output chunk
+            at most GIT_HTTP_BODY_CHUNK_SIZE bytes long.
+    """
+
+    decompressor = get_body_decompressor()
+    for chunk in chunks:
+        for output in decompress_body_chunk(decompressor, chunk, False):
+            yield output
+    for output in decompress_body_chunk(decompressor, b'', True):
+        yield output
+
+
+def get_body_decompressor():
+    """
+        Returns a decompressor for a gzip encoded request body, to be used with 'decompress_body_chunk'.
+    """
+
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def decompress_body_chunk(decompressor, chunk, last):
+    """
+        Yields the given chunk of a gzip encoded request body decompressed, in pieces of at most
+            GIT_HTTP_BODY_CHUNK_SIZE bytes. Decompressor is flushed on 'last' chunk of body.
+            Both WSGI and ASGI applications decompress request bodies by this.
+    """
+
+    while chunk:
+        output = decompressor.decompress(chunk, GIT_HTTP_BODY_CHUNK_SIZE)
+        if output:
+            yield output
+        chunk = decompressor.unconsumed_tail
+    if last:
+        output = decompressor.flush()
+        if output:
+            yield output
+
+
+class GitResponseMixin:
+    """
+        Common parts of git http responses, either buffered or streaming.
     """
 
     def __init__(self, *args, **kwargs):
@@ -31,26 +124,16 @@ class GitResponse(HttpResponse):
         self.action = kwargs.pop('action', None)
         self.repository = kwargs.pop('repository', None)
         self.data = kwargs.pop('data', None)
-        super(GitResponse, self).__init__(*args, **kwargs)
+        self.protocol = kwargs.pop('protocol', None)
+        super(GitResponseMixin, self).__init__(*args, **kwargs)
 
 
-    def get_packet_length(self, packet):
+    def is_protocol_v2(self):
         """
-            Returns length of the given packet in a 4 byte hex string.
-            This string is placed at the beginning of the response body.
-
-            e.g.
-                001e
+            Returns true if client requested protocol v2, which is only spoken by 'git-upload-pack'.
         """
 
-        hex = '0123456789abcdef'
-        length = len(packet) + 4
-        prefix = hex[int((length >> 12) & 0xf)]
-        prefix = prefix + hex[int((length >> 8) & 0xf)]
-        prefix = prefix + hex[int((length >> 4) & 0xf)]
-        prefix = prefix + hex[int((length) & 0xf)]
-
-        return prefix
+        return self.service == GIT_SERVICE_UPLOAD_PACK and get_git_protocol_version(self.protocol) == GIT_PROTOCOL_V2
 
 
     def get_header_expires(self):
@@ -102,25 +185,32 @@ class GitResponse(HttpResponse):
         """
             Sets response headers, according to the requested service and action.
             Header contains values such as 'Expires', 'Pragma', 'Cache-Control' and 'Content-Type'.
+            Responses differ by requested wire protocol, so 'Vary' header includes 'Git-Protocol'.
         """
 
         self.__setitem__('Expires', self.get_header_expires())
         self.__setitem__('Pragma', self.get_header_pragma())
         self.__setitem__('Cache-Control', self.get_header_cache_control())
         self.__setitem__('Content-Type', self.get_header_content_type())
+        self.__setitem__('Vary', 'Git-Protocol')
 
 
+class GitResponse(GitResponseMixin, HttpResponse):
+    """
+        Git http response.
+    """
+
     def set_response_first_line(self):
         """
             Sets first line of git response that includes length and requested service.
+                Protocol v2 responses have no such line.
 
             e.g.
                 001f# service=git-receive-pack
         """
 
-        first_line = '# service={0}\n'.format(self.service)
-        prefix = self.get_packet_length(first_line)
-        self.write('{0}{1}0000'.format(prefix, first_line))
+        if not self.is_protocol_v2():
+            self.write(encode_packet('# service={0}\n'.format(self.service)) + FLUSH_PKT)
 
 
     def set_response_payload(self, payload_type):
@@ -129,7 +219,7 @@ class GitResponse(HttpResponse):
         """
 
         if payload_type == GIT_HTTP_INFO_REFS:
-            self.write(self.repository.get_info_refs(self.service))
+            self.write(self.repository.get_info_refs(self.service, self.protocol))
         elif payload_type == GIT_HTTP_SERVICE_RECEIVE_PACK:
             self.write(self.repository.commit(self.data))
         elif payload_type == GIT_HTTP_SERVICE_UPLOAD_PACK:
@@ -165,3 +255,72 @@ class GitResponse(HttpResponse):
         except BaseException as e:
             logger.error(e)
             return get_http_error(e)
+
+
+class GitStreamingResponse(GitResponseMixin, StreamingHttpResponse):
+    """
+        Git http response which streams output of git services chunk by chunk,
+            so memory usage stays flat regardless of repository (and packfile) size.
+    """
+
+    def set_response_payload(self, payload_type):
+        """
+            Sets streaming content of response to the output of requested git service.
+                Cacheable 'git-upload-pack' requests (e.g. clones) are answered from cache if possible.
+        """
+
+        if payload_type == GIT_HTTP_SERVICE_RECEIVE_PACK:
+            self.received, self.refs_fingerprint = False, self.repository.get_refs_fingerprint()
+            self.streaming_content = self.mark_received(self.repository.commit_stream(self.data, self.protocol))
+        elif payload_type == GIT_HTTP_SERVICE_UPLOAD_PACK:
+            data, key, fingerprint = packcache.read_request(self.repository, self.protocol, self.data)
+            cached = packcache.lookup(key)
+            redirect = None if cached is None else packcache.get_redirect(cached)
+            cached_file = None if cached is None or redirect is not None else packcache.open_cached(cached)
+            if redirect is not None:    # web server sends cached response itself.
+                self.__setitem__('X-Accel-Redirect', redirect)
+                self.streaming_content = []
+            elif cached_file is not None:
+                self.streaming_content = packcache.read(cached_file)
+            else:
+                self.streaming_content = packcache.store(self.repository, key, fingerprint,
+                                                            self.repository.pull_stream(data, self.protocol))
+
+
+    def mark_received(self, chunks):
+        """
+            Yields the given 'git receive-pack' output chunks and marks response as received
+                once they are all streamed and git has exited successfully.
+        """
+
+        status = yield from chunks
+        self.received = status == 0
+
+
+    def close(self):
+        """
+            Called by server after response is sent. 'post_receive' signal of a completed push is sent
+                here, so client isn't kept waiting for it's receivers (e.g. statistics indexing).
+        """
+
+        super().close()
+        if getattr(self, 'received', False):
+            self.received = False
+            send_post_receive_signal(self.__class__, self.repository, self.refs_fingerprint)
+
+
+    def get_http_service_rpc(self):
+        """
+            Returns a StreamingHttpResponse to 'git-upload-pack', 'git-receive-pack' requests.
+        """
+
+        try:
+            self.set_response_header()
+            if self.service == GIT_SERVICE_RECEIVE_PACK:
+                self.set_response_payload(GIT_HTTP_SERVICE_RECEIVE_PACK)
+            elif self.service == GIT_SERVICE_UPLOAD_PACK:
+                self.set_response_payload(GIT_HTTP_SERVICE_UPLOAD_PACK)
+            return self
+        except BaseException as e:
+            logger.error(e)
+            return get_http_error(e)
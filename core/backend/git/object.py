@@ -1,13 +1,87 @@
+import re
 from abc import ABCMeta, abstractmethod
 
+from django.conf import settings
+
 from utils.system import run_command
-from utils.date import time_to_utc
+from utils.date import timestamp_to_utc
 
 GIT_BLOB_OBJECT = 'blob'
 GIT_TREE_OBJECT = 'tree'
 GIT_COMMIT_OBJECT = 'commit'
 GIT_VALID_OBJECT_KINDS = [GIT_BLOB_OBJECT, GIT_TREE_OBJECT, GIT_COMMIT_OBJECT]
 
+GIT_BINARY_CHECK_SIZE = 8000    # blobs with a null byte in this many first bytes are binary, just like git decides.
+GIT_TREE_ENTRY_MODES = {b'40000': GIT_TREE_OBJECT, b'160000': GIT_COMMIT_OBJECT}  # other modes are blobs.
+GIT_TREE_ENTRY_PATTERN = re.compile(rb'([0-7]+) ([^\0]*)\0')
+GIT_IDENTITY_PATTERN = re.compile(r'^(.*?) ?<(.*)> (\d+) [-+]\d{4}$')
+
+# 'git log' format for commit records, fields are separated by null characters.
+GIT_LOG_FORMAT = '%H%x00%T%x00%P%x00%an%x00%ae%x00%at%x00%cn%x00%ce%x00%ct%x00%s'
+GIT_LOG_FIELDS = ['sha1_hash', 'tree', 'parents', 'author_name', 'author_email', 'author_time',
+                    'committer_name', 'committer_email', 'committer_time', 'subject']
+
+
+def parse_tree(content):
+    """
+        Parses raw content of a tree object (bytes or a memoryview) and returns a list of (kind, sha1_hash, name)
+            for it's entries. Each entry is stored as '<mode> <name>\\0<20 bytes of SHA-1 hash>' in a tree object.
+    """
+
+    entries, position, end = [], 0, len(content)
+    while position < end:
+        entry = GIT_TREE_ENTRY_PATTERN.match(content, position)
+        if entry is None:
+            raise ValueError('Invalid tree entry')
+        position = entry.end()
+        kind = GIT_TREE_ENTRY_MODES.get(entry.group(1), GIT_BLOB_OBJECT)
+        entries.append((kind, content[position:position + 20].hex(), entry.group(2).decode('utf-8', 'replace')))
+        position = position + 20
+    return entries
+
+
+def is_binary(data):
+    """
+        Returns true if the given beginning of a blob's content (bytes or a memoryview) is binary.
+    """
+
+    return bytes(data[:GIT_BINARY_CHECK_SIZE]).find(b'\0') != -1
+
+
+def parse_log_record(record):
+    """
+        Parses a commit record printed by 'git log' in GIT_LOG_FORMAT and returns a dict
+            with the same keys as 'parse_commit' plus the commit SHA-1 hash.
+    """
+
+    commit = dict(zip(GIT_LOG_FIELDS, record.decode('utf-8', 'replace').split('\0')))
+    commit['parents'] = commit['parents'].split()
+    commit['author_time'], commit['committer_time'] = int(commit['author_time']), int(commit['committer_time'])
+    return commit
+
+
+def parse_commit(content):
+    """
+        Parses raw content of a commit object and returns a dict containing it's tree, parents,
+            author and committer (name, email and unix timestamp) and subject.
+    """
+
+    headers, _, message = str(content, 'utf-8', 'replace').partition('\n\n')
+    commit = {'tree': None, 'parents': [], 'subject': ' '.join(message.split('\n\n')[0].split('\n')).strip()}
+    for line in headers.split('\n'):
+        key, _, value = line.partition(' ')
+        if key == 'tree':
+            commit['tree'] = value
+        elif key == 'parent':
+            commit['parents'].append(value)
+        elif key in ['author', 'committer']:
+            identity = GIT_IDENTITY_PATTERN.match(value)
+            name, email, timestamp = identity.groups() if identity else ('', '', 0)
+            commit['{0}_name'.format(key)] = name
+            commit['{0}_email'.format(key)] = email
+            commit['{0}_time'.format(key)] = int(timestamp)
+    return commit
+
 
 class GitObject:
     """
@@ -22,12 +96,13 @@ class GitObject:
     """
 
     __metaclass__ = ABCMeta
+    __slots__ = ['repo', 'kind', 'rev']
 
 
     @abstractmethod
     def __init__(self, repo, kind, rev):
         if repo is None: raise ValueError('Repository reference is None')
-        if not repo.is_valid(): raise ValueError('Entered repository is not valid')
+        if not repo.is_valid(revalidate=False): raise ValueError('Entered repository is not valid')
 
         self.repo = repo
         self.kind = kind
@@ -113,11 +188,15 @@ class GitBlob(GitObject):
         Path of object is needed for locating and getting blob's information.
     """
 
+    __slots__ = ['path', 'last_commit', 'info']
+
     def __init__(self, repo, path, rev='HEAD'):
         if path is None: raise ValueError('Path of blob should not be None')
 
         super(GitBlob, self).__init__(repo, GIT_BLOB_OBJECT, rev)
         self.path = path
+        self.last_commit = None  # latest commit touching this blob, if it's already resolved by repository.
+        self.info = None         # (sha1_hash, kind, size) of blob, once it's read.
 
 
     def get_path(self):
@@ -128,15 +207,24 @@ class GitBlob(GitObject):
         return self.path
 
 
+    def get_last_commit(self):
+        """
+            Returns latest commit touching this blob (None if there's not any). It's resolved by
+                repository at most once, with a single path-limited history query.
+        """
+
+        if self.last_commit is None:
+            self.last_commit = self.repo.get_last_commit(self.rev, self.path)
+        return self.last_commit
+
+
     def get_subject(self):
         """
             Returns latest commit message given to this blob.
         """
 
-        cmd = 'git log -1 --format="%s" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_subject()
 
 
     def get_committer_date(self):
@@ -144,10 +232,8 @@ class GitBlob(GitObject):
             Returns latest commiter date for this blob in "ISO 8601-like" format and UTC timezone.
         """
 
-        cmd = 'git log -1 --format="%ci" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True)
-        return time_to_utc(git_output.strip())
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_committer_date()
 
 
     def get_committer_email(self):
@@ -155,10 +241,8 @@ class GitBlob(GitObject):
             Returns committer email.
         """
 
-        cmd = 'git log -1 --format="%ce" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_committer_email()
 
 
     def get_committer_name(self):
@@ -166,10 +250,81 @@ class GitBlob(GitObject):
             Returns committer name.
         """
 
-        cmd = 'git log -1 --format="%cn" {0} -- {1}'.format(self.rev, self.path)
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_committer_name()
 
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+
+    def get_info(self):
+        """
+            Returns (sha1_hash, size) of blob or None if there's no blob in it's path and revision.
+        """
+
+        if self.info is None:
+            self.info = self.repo.get_object_info('{0}:{1}'.format(self.rev, self.path)) or (None, None, None)
+        if self.info[1] != GIT_BLOB_OBJECT:
+            return None
+        return self.info[0], self.info[2]
+
+
+    def get_size(self):
+        """
+            Returns size of blob's content in bytes.
+        """
+
+        info = self.get_info()
+        return None if info is None else info[1]
+
+
+    def stream(self, start=0, end=None):
+        """
+            Yields content of blob in chunks, without holding it in memory as a whole. A byte range
+                of content can be given by 'start' and 'end' (inclusive) offsets.
+        """
+
+        info = self.get_info()
+        if info is None:
+            return
+
+        offset, end = 0, info[1] - 1 if end is None else end
+        git_output = self.repo.stream_blob(info[0])
+        try:
+            for chunk in git_output:
+                view = memoryview(chunk)[max(start - offset, 0):end + 1 - offset]
+                offset = offset + len(chunk)
+                if len(view) > 0:
+                    yield bytes(view)
+                if offset > end:
+                    break
+        finally:
+            git_output.close()
+
+
+    def get_head(self, size):
+        """
+            Returns at most first 'size' bytes of blob's content, e.g. for checking whether it's binary.
+        """
+
+        info = self.get_info()
+        return b'' if info is None else self.repo.read_blob_head(info[0], size)
+
+
+    def get_preview(self):
+        """
+            Returns a preview of blob's content for showing it in pages, which is a dict of it's
+                'content' (at most settings.GIT_BLOB_PREVIEW_SIZE bytes of it, decoded), it's 'size'
+                and whether it's 'binary' (then content is empty) or 'truncated'.
+        """
+
+        size = self.get_size()
+        if size is None:
+            return {'content': '', 'size': 0, 'binary': False, 'truncated': False}
+
+        head = self.get_head(settings.GIT_BLOB_PREVIEW_SIZE)
+        read = len(head)
+
+        if is_binary(head):
+            return {'content': '', 'size': size, 'binary': True, 'truncated': False}
+        return {'content': str(head, 'utf-8', 'replace'), 'size': size, 'binary': False, 'truncated': read < size}
 
 
     def show(self):
@@ -177,9 +332,10 @@ class GitBlob(GitObject):
             Reads content of blob and returns it as a pretty formated output.
         """
 
-        level = '{0}:{1}'.format(self.rev, self.path)
-        file_content = run_command(cmd='git cat-file -p {0}'.format(level), data=None, location=self.repo.location, chw=True)
-        return file_content
+        blob = self.repo.read_object('{0}:{1}'.format(self.rev, self.path))
+        if blob is None or blob[1] != GIT_BLOB_OBJECT:
+            return ''
+        return str(blob[3], 'utf-8', 'replace')
 
 
     def __str__(self):
@@ -196,11 +352,14 @@ class GitTree(GitObject):
         Path of object is needed for locating and getting tree's information.
     """
 
+    __slots__ = ['path', 'last_commit']
+
     def __init__(self, repo, path, rev='HEAD'):
         if path is None: raise ValueError('Path of tree should not be None')
 
         super(GitTree, self).__init__(repo, GIT_TREE_OBJECT, rev)
         self.path = path
+        self.last_commit = None  # latest commit touching this tree, if it's already resolved by repository.
 
 
     def get_path(self):
@@ -211,15 +370,24 @@ class GitTree(GitObject):
         return self.path
 
 
+    def get_last_commit(self):
+        """
+            Returns latest commit touching this tree (None if there's not any). It's resolved by
+                repository at most once, with a single path-limited history query.
+        """
+
+        if self.last_commit is None:
+            self.last_commit = self.repo.get_last_commit(self.rev, self.path)
+        return self.last_commit
+
+
     def get_subject(self):
         """
             Returns latest commit message given to this tree.
         """
 
-        cmd = 'git log -1 --format="%s" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_subject()
 
 
     def get_committer_date(self):
@@ -227,10 +395,8 @@ class GitTree(GitObject):
             Returns latest commiter date for this tree in "ISO 8601-like" format and UTC timezone.
         """
 
-        cmd = 'git log -1 --format="%ci" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True)
-        return time_to_utc(git_output.strip())
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_committer_date()
 
 
     def get_committer_email(self):
@@ -238,10 +404,8 @@ class GitTree(GitObject):
             Returns committer email.
         """
 
-        cmd = 'git log -1 --format="%ce" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_committer_email()
 
 
     def get_committer_name(self):
@@ -249,10 +413,8 @@ class GitTree(GitObject):
             Returns committer name.
         """
 
-        cmd = 'git log -1 --format="%cn" {0} -- {1}'.format(self.rev, self.path)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        last_commit = self.get_last_commit()
+        return '' if last_commit is None else last_commit.get_committer_name()
 
 
     def show(self):
@@ -260,17 +422,19 @@ class GitTree(GitObject):
             Returns content of tree object which may be other trees or blobs.
         """
 
-        level = '{0}:{1}'.format(self.rev, self.path)
-        cmd = 'git ls-tree --full-tree {0}'.format(level)
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).split('\n')[:-1]
+        tree = self.repo.read_object('{0}:{1}'.format(self.rev, self.path))
+        if tree is None or tree[1] != GIT_TREE_OBJECT:
+            return []
 
         tree_contents = []
-        for item in git_output:
-            kind, path = item.split()[1], '{0}/{1}'.format(self.path, item.split()[3])
+        for kind, sha1_hash, name in parse_tree(tree[3]):
+            path = '{0}/{1}'.format(self.path, name)
             if kind == GIT_BLOB_OBJECT:
                 tree_contents.append(GitBlob(repo=self.repo, path=path, rev=self.rev))
             elif kind == GIT_TREE_OBJECT:
                 tree_contents.append(GitTree(repo=self.repo, path=path, rev=self.rev))
+
+        self.repo.set_last_commits(tree_contents, self.rev, self.path)
         return tree_contents
 
 
@@ -286,13 +450,45 @@ class GitCommit(GitObject):
     """
         Represents a Git commit object.
         SHA1 hash of object is needed for locating and getting object's information.
+        Commit metadata is kept in slots (named as GIT_LOG_FIELDS) so many commits can be held compactly.
+            Metadata is either given on creation (e.g. parsed from 'git log' records) or read from
+            repository on the first access to one of it's fields.
     """
 
-    def __init__(self, repo, sha1_hash, rev='HEAD'):
+    __slots__ = GIT_LOG_FIELDS
+
+
+    def __init__(self, repo, sha1_hash, rev='HEAD', data=None):
         if sha1_hash is None: raise ValueError('SHA-1 hash of commit should not be None')
 
         super(GitCommit, self).__init__(repo, GIT_COMMIT_OBJECT, rev)
         self.sha1_hash = sha1_hash
+        if data is not None:
+            self._set_fields(data)
+
+
+    def _set_fields(self, data):
+        """
+            Fills commit fields with the given parsed commit.
+        """
+
+        for field in GIT_LOG_FIELDS[1:]:
+            setattr(self, field, data[field])
+
+
+    def __getattr__(self, name):
+        """
+            Called only for unset fields, reads commit object from repository to fill them.
+        """
+
+        if not name in GIT_LOG_FIELDS:
+            raise AttributeError(name)
+
+        commit = self.repo.read_object(self.sha1_hash)
+        if commit is None or commit[1] != GIT_COMMIT_OBJECT:
+            raise ValueError('Commit {0} does not exist'.format(self.sha1_hash))
+        self._set_fields(parse_commit(commit[3]))
+        return getattr(self, name)
 
 
     def get_sha1_hash(self):
@@ -308,10 +504,7 @@ class GitCommit(GitObject):
             Returns latest commit message given to this commit.
         """
 
-        cmd='git log -1 --format="%s" {0}'.format(self.sha1_hash)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        return self.subject
 
 
     def get_committer_date(self):
@@ -319,10 +512,7 @@ class GitCommit(GitObject):
             Returns latest commiter date for this commit in "ISO 8601-like" format and UTC timezone.
         """
 
-        cmd='git log -1 --format="%ci" {0}'.format(self.sha1_hash)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True)
-        return time_to_utc(git_output.strip())
+        return timestamp_to_utc(self.committer_time)
 
 
     def get_committer_email(self):
@@ -330,10 +520,7 @@ class GitCommit(GitObject):
             Returns committer email.
         """
 
-        cmd='git log {0} -1 --format="%ce" {1}'.format(self.rev, self.sha1_hash)
-
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+        return self.committer_email
 
 
     def get_committer_name(self):
@@ -341,10 +528,39 @@ class GitCommit(GitObject):
             Returns committer name.
         """
 
-        cmd='git log {0} -1 --format="%cn" {1}'.format(self.rev, self.sha1_hash)
+        return self.committer_name
 
-        git_output = run_command(cmd=cmd, data=None, location=self.repo.location, chw=True).strip()
-        return git_output
+
+    def get_author_date(self):
+        """
+            Returns author date for this commit in "ISO 8601-like" format and UTC timezone.
+        """
+
+        return timestamp_to_utc(self.author_time)
+
+
+    def get_author_email(self):
+        """
+            Returns author email.
+        """
+
+        return self.author_email
+
+
+    def get_author_name(self):
+        """
+            Returns author name.
+        """
+
+        return self.author_name
+
+
+    def get_parents(self):
+        """
+            Returns SHA-1 hashes of commit parents.
+        """
+
+        return self.parents
 
 
     def show(self):
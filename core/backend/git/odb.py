@@ -0,0 +1,521 @@
+import os
+import mmap
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+
+GIT_OBJECT_TYPES = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+GIT_OFS_DELTA = 6
+GIT_REF_DELTA = 7
+
+GIT_PACK_SIGNATURE = b'PACK'
+GIT_PACK_INDEX_SIGNATURE = b'\377tOc'   # version 1 indexes have no signature and start with fanout table.
+GIT_PACK_INDEX_FANOUT_SIZE = 256 * 4
+GIT_PACK_INDEX_LARGE_OFFSET = 0x80000000
+GIT_PACK_INFLATE_CHUNK_SIZE = 64 * 1024     # compressed data is inflated from mmapped packs in chunks of this size.
+GIT_PACK_HEADER_CHUNK_SIZE = 256            # compressed bytes read at once for a delta's or loose object's header.
+GIT_OBJECT_HEADER_SIZE = 32                 # longest header of a loose object ('<kind> <size>\0') or a delta (two sizes).
+GIT_PACK_MAX_DELTA_DEPTH = 4096             # longer chains are considered corrupt ('git repack --depth' is 50 by default).
+
+GIT_DELTA_CACHE_SIZE = 16 * 1024 * 1024     # bytes of delta bases kept in memory by each repository's object store.
+GIT_ODB_CACHE_SIZE = 32                     # number of repositories whose object stores are kept open by each worker.
+
+
+class GitPackIndex:
+    """
+        A memory-mapped '.idx' file of a packfile (version 1 or 2). Objects are looked up by binary
+            search of their SHA-1 hash in the range of sorted hashes given by fanout table for it's
+            first byte, so a lookup touches a few pages of index and nothing is read upfront.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as index_file:
+            self.map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:4] == GIT_PACK_INDEX_SIGNATURE:
+            if struct.unpack_from('>I', self.map, 4)[0] != 2:
+                raise ValueError('Unsupported pack index version in {0}'.format(path))
+            self.version, self.fanout = 2, 8
+        else:
+            self.version, self.fanout = 1, 0
+        self.count = struct.unpack_from('>I', self.map, self.fanout + GIT_PACK_INDEX_FANOUT_SIZE - 4)[0]
+        self.hashes = self.fanout + GIT_PACK_INDEX_FANOUT_SIZE
+
+
+    def _get_hash(self, position):
+        """
+            Returns binary SHA-1 hash of the object at the given position of index.
+        """
+
+        if self.version == 2:
+            start = self.hashes + position * 20
+        else:   # version 1 entries are a 4 bytes offset followed by hash.
+            start = self.hashes + position * 24 + 4
+        return self.map[start:start + 20]
+
+
+    def _get_offset(self, position):
+        """
+            Returns packfile offset of the object at the given position of index.
+        """
+
+        if self.version == 1:
+            return struct.unpack_from('>I', self.map, self.hashes + position * 24)[0]
+
+        offsets = self.hashes + self.count * 24     # after hashes and CRC32 checksums.
+        offset = struct.unpack_from('>I', self.map, offsets + position * 4)[0]
+        if offset & GIT_PACK_INDEX_LARGE_OFFSET:
+            large_offsets = offsets + self.count * 4
+            offset = struct.unpack_from('>Q', self.map, large_offsets + (offset & ~GIT_PACK_INDEX_LARGE_OFFSET) * 8)[0]
+        return offset
+
+
+    def find(self, binary_hash):
+        """
+            Returns packfile offset of an object by it's binary SHA-1 hash or None if it's not in pack.
+        """
+
+        first = binary_hash[0]
+        low = struct.unpack_from('>I', self.map, self.fanout + (first - 1) * 4)[0] if first > 0 else 0
+        high = struct.unpack_from('>I', self.map, self.fanout + first * 4)[0]
+        while low < high:
+            middle = (low + high) // 2
+            current = self._get_hash(middle)
+            if current < binary_hash:
+                low = middle + 1
+            elif current > binary_hash:
+                high = middle
+            else:
+                return self._get_offset(middle)
+        return None
+
+
+class GitPack:
+    """
+        A memory-mapped packfile along with it's index. Entries are decoded in place from the
+            mapping: their headers are parsed and their compressed data is inflated straight out
+            of mapped pages, without reading the file into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = GitPackIndex(path[:-len('.pack')] + '.idx')
+        with open(path, 'rb') as pack_file:
+            self.map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:4] != GIT_PACK_SIGNATURE:
+            raise ValueError('{0} is not a packfile'.format(path))
+
+
+    def read_entry_header(self, offset):
+        """
+            Parses header of the entry at the given offset and returns (type, size, base, data_offset),
+                where base is the offset of a OFS_DELTA's base, the binary SHA-1 hash of a REF_DELTA's
+                base or None, and data_offset is where entry's compressed data starts.
+        """
+
+        entry, byte = offset, self.map[offset]
+        kind, size, shift, offset = (byte >> 4) & 7, byte & 15, 4, offset + 1
+        while byte & 0x80:
+            byte = self.map[offset]
+            size, shift, offset = size | ((byte & 0x7f) << shift), shift + 7, offset + 1
+
+        base = None
+        if kind == GIT_OFS_DELTA:   # a big-endian number, with one added to each continued byte.
+            byte = self.map[offset]
+            distance, offset = byte & 0x7f, offset + 1
+            while byte & 0x80:
+                byte = self.map[offset]
+                distance, offset = ((distance + 1) << 7) | (byte & 0x7f), offset + 1
+            base = entry - distance
+        elif kind == GIT_REF_DELTA:
+            base, offset = self.map[offset:offset + 20], offset + 20
+        return kind, size, base, offset
+
+
+    def inflate(self, offset, size):
+        """
+            Inflates compressed data starting at the given offset, which should be 'size' bytes.
+        """
+
+        decompressor, chunks, view = zlib.decompressobj(), [], memoryview(self.map)
+        try:
+            while not decompressor.eof:
+                chunk = view[offset:offset + GIT_PACK_INFLATE_CHUNK_SIZE]
+                if len(chunk) == 0:
+                    raise ValueError('Truncated entry in {0}'.format(self.path))
+                chunks.append(decompressor.decompress(chunk))
+                chunk.release()
+                offset = offset + GIT_PACK_INFLATE_CHUNK_SIZE
+        finally:
+            view.release()
+
+        data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        if len(data) != size:
+            raise ValueError('Corrupt entry in {0}'.format(self.path))
+        return data
+
+
+    def inflate_head(self, offset, size):
+        """
+            Inflates first 'size' bytes (or all, if it's shorter) of compressed data starting at the given offset.
+        """
+
+        return inflate_head(lambda position, length: self.map[offset + position:offset + position + length], size)
+
+
+def inflate_head(read, size):
+    """
+        Inflates first 'size' bytes of compressed data (or all, if it's shorter), which is read in chunks
+            by calling 'read' with offset and length of each chunk. Chunks are small for headers and
+            never larger than GIT_PACK_INFLATE_CHUNK_SIZE, so only about as much as needed is read.
+    """
+
+    length = min(max(size, GIT_PACK_HEADER_CHUNK_SIZE), GIT_PACK_INFLATE_CHUNK_SIZE)
+    decompressor, chunks, inflated, position = zlib.decompressobj(), [], 0, 0
+    while inflated < size and not decompressor.eof:
+        chunk = decompressor.unconsumed_tail
+        if not chunk:
+            chunk = read(position, length)
+            if not chunk:
+                break
+            position = position + len(chunk)
+        data = decompressor.decompress(chunk, size - inflated)
+        chunks.append(data)
+        inflated = inflated + len(data)
+    return b''.join(chunks)
+
+
+def read_varint(data, position):
+    """
+        Reads a little-endian variable length number (as used in delta headers) and returns (number, next position).
+    """
+
+    number, shift = 0, 0
+    while True:
+        byte = data[position]
+        number, shift, position = number | ((byte & 0x7f) << shift), shift + 7, position + 1
+        if not byte & 0x80:
+            return number, position
+
+
+def apply_delta(base, delta):
+    """
+        Applies a delta to content of it's base object and returns the resulting content. A delta
+            is base and result sizes followed by instructions either copying a range of base or
+            inserting the bytes following them.
+    """
+
+    base_size, position = read_varint(delta, 0)
+    result_size, position = read_varint(delta, position)
+    if base_size != len(base):
+        raise ValueError('Delta does not match it\'s base')
+
+    result, written, end = bytearray(result_size), 0, len(delta)
+    while position < end:
+        instruction, position = delta[position], position + 1
+        if instruction & 0x80:      # copy from base.
+            offset, size = 0, 0
+            for i in range(4):
+                if instruction & (1 << i):
+                    offset, position = offset | (delta[position] << (8 * i)), position + 1
+            for i in range(3):
+                if instruction & (0x10 << i):
+                    size, position = size | (delta[position] << (8 * i)), position + 1
+            size = size or 0x10000
+            if offset + size > base_size:
+                raise ValueError('Delta copies out of it\'s base')
+            result[written:written + size] = base[offset:offset + size]
+        elif instruction:           # insert the next 'instruction' bytes.
+            size = instruction
+            if position + size > end:
+                raise ValueError('Truncated delta')
+            result[written:written + size] = delta[position:position + size]
+            position = position + size
+        else:
+            raise ValueError('Invalid delta instruction')
+        written = written + size
+        if written > result_size:
+            raise ValueError('Delta result size mismatch')
+
+    if written != result_size:
+        raise ValueError('Delta result size mismatch')
+    return result
+
+
+class GitObjectStore:
+    """
+        Native reader of a repository's objects, from it's packfiles (memory-mapped) and loose objects,
+            without running any git command. Objects are returned as (kind, size, content) where content
+            is a memoryview over inflated data, so slicing it (e.g. tree entries) doesn't copy it.
+        Packfiles are listed again whenever 'objects/pack' folder changes (e.g. after a push or repack).
+            Replaced packs stay mapped until their objects are no more used, so concurrent reads
+            never see them disappear. Bases of deltas are kept in a small LRU cache, since chains
+            often share them (e.g. consecutive versions of the same file).
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self.objects = os.path.join(location, 'objects')
+        self.lock = threading.Lock()
+        self.packs, self.signature = [], None
+        self.bases, self.bases_size = OrderedDict(), 0
+
+
+    def _get_packs(self):
+        """
+            Returns mapped packfiles of repository, mapping them again if 'objects/pack' has changed.
+        """
+
+        folder = os.path.join(self.objects, 'pack')
+        try:
+            stat = os.stat(folder)
+            signature = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return []
+
+        with self.lock:
+            if signature == self.signature:
+                return self.packs
+
+        packs = {pack.path: pack for pack in self.packs}
+        updated = []
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not name.endswith('.pack') or not os.path.exists(path[:-len('.pack')] + '.idx'):
+                continue
+            try:
+                updated.append(packs[path] if path in packs else GitPack(path))
+            except (OSError, ValueError):   # e.g. an index being written or removed.
+                continue
+
+        with self.lock:
+            self.packs, self.signature = updated, signature
+            self.bases.clear()
+            self.bases_size = 0
+        return updated
+
+
+    def _find(self, binary_hash):
+        """
+            Returns (pack, offset) of an object in packfiles or None if it's not packed.
+        """
+
+        for pack in self._get_packs():
+            offset = pack.index.find(binary_hash)
+            if offset is not None:
+                return pack, offset
+        return None
+
+
+    def _get_loose_path(self, sha1_hash):
+        """
+            Returns location of a loose object.
+        """
+
+        return os.path.join(self.objects, sha1_hash[:2], sha1_hash[2:])
+
+
+    def _read_loose(self, sha1_hash, head_size=None):
+        """
+            Reads a loose object and returns (kind, size, content) or None if there's no such loose object.
+                With 'head_size' only that many first bytes of content are inflated and returned. Loose
+                objects are '<kind> <size>\\0<content>', deflated.
+        """
+
+        try:
+            with open(self._get_loose_path(sha1_hash), 'rb') as loose_file:
+                if head_size is not None:
+                    data = inflate_head(lambda position, length: loose_file.read(length), GIT_OBJECT_HEADER_SIZE + head_size)
+                else:
+                    data = zlib.decompress(loose_file.read())
+        except OSError:
+            return None
+
+        null = data.find(b'\0')
+        kind, _, size = data[:null].decode('ascii').partition(' ')
+        if head_size is not None:
+            return kind, int(size), memoryview(data)[null + 1:null + 1 + head_size]
+        content = memoryview(data)[null + 1:]
+        if len(content) != int(size):
+            raise ValueError('Corrupt loose object {0}'.format(sha1_hash))
+        return kind, int(size), content
+
+
+    def _get_base(self, pack, offset):
+        """
+            Returns a cached (type, content) of the given pack entry or None.
+        """
+
+        with self.lock:
+            base = self.bases.get((pack.path, offset))
+            if base is not None:
+                self.bases.move_to_end((pack.path, offset))
+            return base
+
+
+    def _set_base(self, pack, offset, kind, content):
+        """
+            Caches content of a pack entry which is a delta base, evicting least recently used ones
+                past GIT_DELTA_CACHE_SIZE bytes.
+        """
+
+        if len(content) > GIT_DELTA_CACHE_SIZE // 4:
+            return
+        with self.lock:
+            if (pack.path, offset) in self.bases:
+                return
+            self.bases[(pack.path, offset)] = (kind, content)
+            self.bases_size = self.bases_size + len(content)
+            while self.bases_size > GIT_DELTA_CACHE_SIZE:
+                evicted = self.bases.popitem(last=False)[1]
+                self.bases_size = self.bases_size - len(evicted[1])
+
+
+    def _resolve_base(self, pack, base):
+        """
+            Returns (pack, offset) of a delta's base, which is an offset in the same pack or a binary
+                SHA-1 hash (possibly of an object in another pack).
+        """
+
+        if isinstance(base, int):
+            return pack, base
+        location = self._find(base)
+        if location is None:
+            raise ValueError('Missing delta base {0}'.format(base.hex()))
+        return location
+
+
+    def _read_packed(self, pack, offset):
+        """
+            Reads a pack entry and returns (type, content), resolving chain of deltas it may be on
+                iteratively: bases are walked down to a non delta entry (or a cached one) and then
+                deltas are applied back up.
+        """
+
+        deltas = []
+        while True:
+            cached = self._get_base(pack, offset)
+            if cached is not None:
+                kind, content = cached
+                break
+
+            kind, size, base, data_offset = pack.read_entry_header(offset)
+            if kind in GIT_OBJECT_TYPES:
+                content = pack.inflate(data_offset, size)
+                if deltas:
+                    self._set_base(pack, offset, kind, content)
+                break
+            if kind not in [GIT_OFS_DELTA, GIT_REF_DELTA] or len(deltas) > GIT_PACK_MAX_DELTA_DEPTH:
+                raise ValueError('Invalid entry at {0} of {1}'.format(offset, pack.path))
+
+            deltas.append((pack, offset, pack.inflate(data_offset, size)))
+            pack, offset = self._resolve_base(pack, base)
+
+        for position in range(len(deltas) - 1, -1, -1):
+            pack, offset, delta = deltas[position]
+            content = apply_delta(content, delta)
+            if position > 0:
+                self._set_base(pack, offset, kind, content)
+        return kind, content
+
+
+    def _read_packed_header(self, pack, offset):
+        """
+            Returns (type, size) of a pack entry. Size of a delta's result is read from the beginning
+                of it's data and type is it's base's, so deltas are never applied.
+        """
+
+        size = None
+        for depth in range(GIT_PACK_MAX_DELTA_DEPTH):
+            kind, entry_size, base, data_offset = pack.read_entry_header(offset)
+            if kind in GIT_OBJECT_TYPES:
+                return kind, entry_size if size is None else size
+            if kind not in [GIT_OFS_DELTA, GIT_REF_DELTA]:
+                break
+            if size is None:
+                head = pack.inflate_head(data_offset, GIT_OBJECT_HEADER_SIZE)
+                size = read_varint(head, read_varint(head, 0)[1])[0]
+            pack, offset = self._resolve_base(pack, base)
+        raise ValueError('Invalid entry at {0} of {1}'.format(offset, pack.path))
+
+
+    def read(self, sha1_hash):
+        """
+            Returns (kind, size, content) of an object by it's SHA-1 hash or None if it's not found.
+                Content is a memoryview.
+        """
+
+        location = self._find(bytes.fromhex(sha1_hash))
+        if location is None:
+            return self._read_loose(sha1_hash)
+        kind, content = self._read_packed(*location)
+        return GIT_OBJECT_TYPES[kind], len(content), memoryview(content)
+
+
+    def read_header(self, sha1_hash):
+        """
+            Returns (kind, size) of an object by it's SHA-1 hash or None if it's not found.
+        """
+
+        location = self._find(bytes.fromhex(sha1_hash))
+        if location is None:
+            loose = self._read_loose(sha1_hash, 0)
+            return None if loose is None else loose[:2]
+        kind, size = self._read_packed_header(*location)
+        return GIT_OBJECT_TYPES[kind], size
+
+
+    def read_head(self, sha1_hash, size):
+        """
+            Returns (kind, size, head) of an object by it's SHA-1 hash or None if it's not found, where
+                head is a memoryview of at most first 'size' bytes of content. Only that much of loose
+                objects and non delta pack entries is inflated, deltas are resolved whole.
+        """
+
+        location = self._find(bytes.fromhex(sha1_hash))
+        if location is None:
+            return self._read_loose(sha1_hash, size)
+        kind, entry_size, base, data_offset = location[0].read_entry_header(location[1])
+        if kind in GIT_OBJECT_TYPES:
+            return GIT_OBJECT_TYPES[kind], entry_size, memoryview(location[0].inflate_head(data_offset, size))
+        kind, content = self._read_packed(*location)
+        return GIT_OBJECT_TYPES[kind], len(content), memoryview(content)[:size]
+
+
+class GitObjectStores:
+    """
+        A per-worker cache of object stores keyed by repository location, so packfiles stay
+            mapped between requests. Least recently used stores are dropped past GIT_ODB_CACHE_SIZE.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stores = OrderedDict()
+
+
+    def get(self, location):
+        """
+            Returns object store of the given repository.
+        """
+
+        with self.lock:
+            store = self.stores.get(location)
+            if store is None:
+                store = self.stores[location] = GitObjectStore(location)
+            self.stores.move_to_end(location)
+            while len(self.stores) > GIT_ODB_CACHE_SIZE:
+                self.stores.popitem(last=False)
+            return store
+
+
+    def discard(self, location):
+        """
+            Removes object store of a repository, e.g. after it's deleted.
+        """
+
+        with self.lock:
+            self.stores.pop(location, None)
+
+
+object_stores = GitObjectStores()
@@ -0,0 +1,322 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+from django.conf import settings
+
+from git.pktline import GIT_PKTLINE_DATA, decode_packets
+from git.service import get_git_protocol_version
+
+GIT_PACK_CACHE_MAX_REQUEST_SIZE = 1024 * 1024   # longer upload-pack requests are never cached.
+GIT_PACK_CACHE_READ_SIZE = 64 * 1024
+GIT_PACK_CACHE_IGNORED_CAPABILITIES = [b'agent', b'session-id']    # capabilities which don't affect responses.
+GIT_PACK_CACHE_TEMPORARY_PREFIX = 'tmp-'
+GIT_PACK_CACHE_FILE_MODE = 0o644    # cached responses are readable by web server.
+GIT_PACK_CACHE_PINS = 'serving'     # folder of links to responses being sent by web server, safe from eviction.
+GIT_PACK_CACHE_PIN_TIMEOUT = 10 * 60    # links are kept at least this many seconds, for web server to open them.
+
+logger = logging.getLogger('django')
+eviction_lock = threading.Lock()
+
+
+def is_enabled():
+    """
+        Returns true if upload-pack responses cache is enabled by settings.GIT_PACK_CACHE_ROOT.
+    """
+
+    return bool(settings.GIT_PACK_CACHE_ROOT)
+
+
+def normalize_request(body):
+    """
+        Returns a normalized form of the given 'git-upload-pack' request body if it's a cacheable
+            one, else None. Only final requests of negotiation without any 'have' lines (e.g. clones)
+            are cacheable, since they're repeated as is by clients fetching from scratch.
+        Capabilities not affecting response (e.g. client's agent) are removed.
+    """
+
+    lines, done = [], False
+    try:
+        for kind, payload in decode_packets([body]):
+            if kind != GIT_PKTLINE_DATA:
+                lines.append(kind.encode('ascii'))
+                continue
+
+            line = bytes(payload).rstrip(b'\n')
+            if line.startswith(b'have '):
+                return None
+            elif line == b'done':
+                done = True
+
+            words = [word for word in line.split(b' ') if not word.split(b'=')[0] in GIT_PACK_CACHE_IGNORED_CAPABILITIES]
+            if words:
+                lines.append(b' '.join(words))
+    except ValueError:  # not a valid pkt-line stream.
+        return None
+
+    return b'\n'.join(lines) if done else None
+
+
+def read_request(repo, protocol, chunks):
+    """
+        Reads beginning of a 'git-upload-pack' request body from the given chunks and returns
+            (data, key, fingerprint) where 'data' is the whole body to be passed to git (either
+            bytes or an iterable of chunks), 'key' is cache key of request (None if it's not
+            cacheable) and 'fingerprint' is references fingerprint of repository it's based on.
+    """
+
+    if not is_enabled():
+        return chunks, None, None
+
+    head, chunks = [], iter(chunks)
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size = size + len(chunk)
+        if size > GIT_PACK_CACHE_MAX_REQUEST_SIZE:  # too long to be cached, rest of it is streamed.
+            return _chain(head, chunks), None, None
+
+    body = b''.join(head)
+    key, fingerprint = get_key(repo, protocol, body)
+    return body, key, fingerprint
+
+
+def _chain(head, chunks):
+    """
+        Yields the given already read chunks followed by the remaining ones.
+    """
+
+    for chunk in head:
+        yield chunk
+    for chunk in chunks:
+        yield chunk
+
+
+def get_key(repo, protocol, body):
+    """
+        Returns (key, fingerprint) of a 'git-upload-pack' request body, where key addresses cached
+            response by repository, it's references state, protocol version and normalized request.
+            Key is None if request is not cacheable.
+    """
+
+    if not is_enabled():
+        return None, None
+
+    normalized = normalize_request(body)
+    if normalized is None:
+        return None, None
+
+    fingerprint = repo.get_refs_fingerprint()
+    key = hashlib.sha256()
+    for part in [repo.location.encode('utf-8'), fingerprint.encode('ascii'),
+                    str(get_git_protocol_version(protocol)).encode('ascii'), normalized]:
+        key.update(part + b'\x00')
+    return key.hexdigest(), fingerprint
+
+
+def get_path(key):
+    """
+        Returns location of cached response of the given key.
+    """
+
+    return os.path.join(settings.GIT_PACK_CACHE_ROOT, key[:2], key)
+
+
+def lookup(key):
+    """
+        Returns location of cached response of the given key or None if it's not cached.
+            Hits are marked as recently used for eviction.
+    """
+
+    if key is None:
+        return None
+
+    path = get_path(key)
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+
+def get_redirect(path):
+    """
+        Returns 'X-Accel-Redirect' url of the given cached response, for web server to send it
+            itself, or None if there's no such redirect (settings.GIT_PACK_CACHE_REDIRECT) or response
+            is gone. Web server is redirected to a new hard link of response, so it can't be evicted
+            before web server opens it.
+    """
+
+    if not settings.GIT_PACK_CACHE_REDIRECT:
+        return None
+
+    pin = os.path.join(settings.GIT_PACK_CACHE_ROOT, GIT_PACK_CACHE_PINS,
+                        '{0}-{1}'.format(os.path.basename(path), get_pin_period()))
+    try:
+        os.makedirs(os.path.dirname(pin), exist_ok=True)
+        os.link(path, pin)
+    except FileExistsError:     # response is already linked in this period.
+        pass
+    except FileNotFoundError:   # response is just evicted.
+        return None
+    except OSError as e:
+        logger.error('GIT_PACK_CACHE -> ERR ({})'.format(e))
+        return None
+    return settings.GIT_PACK_CACHE_REDIRECT + os.path.relpath(pin, settings.GIT_PACK_CACHE_ROOT)
+
+
+def get_pin_period():
+    """
+        Returns number of current GIT_PACK_CACHE_PIN_TIMEOUT long period, which links are named by.
+    """
+
+    return int(time.time()) // GIT_PACK_CACHE_PIN_TIMEOUT
+
+
+def open_cached(path):
+    """
+        Opens a cached response for reading or returns None if it's gone (e.g. it's just evicted).
+    """
+
+    try:
+        return open(path, 'rb')
+    except OSError:
+        return None
+
+
+def read(cached):
+    """
+        Yields contents of an opened cached response in chunks.
+    """
+
+    with cached:
+        for chunk in iter(lambda: cached.read(GIT_PACK_CACHE_READ_SIZE), b''):
+            yield chunk
+
+
+def open_entry(key):
+    """
+        Returns a temporary file for writing response of the given key into or None if it can't be created.
+    """
+
+    folder = os.path.dirname(get_path(key))
+    try:
+        os.makedirs(folder, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=folder, prefix=GIT_PACK_CACHE_TEMPORARY_PREFIX, delete=False)
+    except OSError as e:
+        logger.error('GIT_PACK_CACHE -> ERR ({})'.format(e))
+        return None
+
+
+def write_entry(entry, chunk):
+    """
+        Writes a response chunk into a temporary response file. Returns false (and removes file)
+            if it can't be written, e.g. disk is full, so response is just not cached.
+    """
+
+    try:
+        entry.write(chunk)
+        return True
+    except OSError as e:
+        logger.error('GIT_PACK_CACHE -> ERR ({})'.format(e))
+        discard_entry(entry)
+        return False
+
+
+def discard_entry(entry):
+    """
+        Closes and removes a temporary response file.
+    """
+
+    try:
+        entry.close()
+    except OSError:
+        pass
+    try:
+        os.remove(entry.name)
+    except OSError:
+        pass
+
+
+def commit_entry(repo, key, fingerprint, entry):
+    """
+        Moves a completely written temporary response file into cache, if it's not larger than
+            settings.GIT_PACK_CACHE_MAX_ENTRY_SIZE and references of repository didn't change
+            while it was being generated. Cache is then evicted down to it's size limit.
+    """
+
+    try:
+        entry.close()
+        if os.path.getsize(entry.name) > settings.GIT_PACK_CACHE_MAX_ENTRY_SIZE or repo.get_refs_fingerprint() != fingerprint:
+            return discard_entry(entry)
+
+        os.chmod(entry.name, GIT_PACK_CACHE_FILE_MODE)
+        os.replace(entry.name, get_path(key))
+    except OSError as e:
+        logger.error('GIT_PACK_CACHE -> ERR ({})'.format(e))
+        return discard_entry(entry)
+    evict()
+
+
+def store(repo, key, fingerprint, chunks):
+    """
+        Yields the given response chunks while writing them into cache for the given key.
+            Response is only cached if it's streamed completely. If key is None chunks are just
+            passed through, just like they are if cache can't be written.
+    """
+
+    entry = None if key is None else open_entry(key)
+    if entry is None:
+        yield from chunks
+        return
+
+    completed = False
+    try:
+        for chunk in chunks:
+            if entry is not None and not write_entry(entry, chunk):
+                entry = None
+            yield chunk
+        completed = True
+    finally:
+        if hasattr(chunks, 'close'):    # e.g. stops git if client has disconnected.
+            chunks.close()
+        if entry is not None and completed:
+            commit_entry(repo, key, fingerprint, entry)
+        elif entry is not None:
+            discard_entry(entry)
+
+
+def evict():
+    """
+        Removes least recently used responses until cache is smaller than settings.GIT_PACK_CACHE_MAX_SIZE,
+            along with links of responses made for web server before previous pin period.
+    """
+
+    with eviction_lock:
+        entries, total = [], 0
+        pins, period = os.path.join(settings.GIT_PACK_CACHE_ROOT, GIT_PACK_CACHE_PINS), get_pin_period()
+        for root, folders, files in os.walk(settings.GIT_PACK_CACHE_ROOT):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if root == pins and int(name.rpartition('-')[2]) < period - 1:
+                        os.remove(path)
+                    if root == pins or name.startswith(GIT_PACK_CACHE_TEMPORARY_PREFIX):
+                        continue
+                    stat = os.stat(path)
+                except (OSError, ValueError):
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total = total + stat.st_size
+
+        for mtime, size, path in sorted(entries):
+            if total <= settings.GIT_PACK_CACHE_MAX_SIZE:
+                break
+            try:
+                os.remove(path)
+                total = total - size
+            except OSError as e:
+                logger.error('GIT_PACK_CACHE -> ERR ({})'.format(e))
@@ -0,0 +1,167 @@
+GIT_PKTLINE_HEADER_SIZE = 4
+GIT_PKTLINE_MAX_SIZE = 65520    # maximum length of a packet including it's 4 bytes header.
+GIT_PKTLINE_MAX_DATA_SIZE = GIT_PKTLINE_MAX_SIZE - GIT_PKTLINE_HEADER_SIZE
+
+# Kinds of packets. Special packets have no payload and are sent as their length header only.
+GIT_PKTLINE_DATA = 'data'
+GIT_PKTLINE_FLUSH = 'flush'                 # '0000', end of a message.
+GIT_PKTLINE_DELIM = 'delim'                 # '0001', separates sections of a message (protocol v2).
+GIT_PKTLINE_RESPONSE_END = 'response-end'   # '0002', end of a response for stateless connections (protocol v2).
+GIT_PKTLINE_SPECIAL_PACKETS = {0: GIT_PKTLINE_FLUSH, 1: GIT_PKTLINE_DELIM, 2: GIT_PKTLINE_RESPONSE_END}
+
+FLUSH_PKT = b'0000'
+DELIM_PKT = b'0001'
+RESPONSE_END_PKT = b'0002'
+
+# Sideband channels of 'side-band' and 'side-band-64k' capabilities.
+GIT_SIDEBAND_DATA = 1
+GIT_SIDEBAND_PROGRESS = 2
+GIT_SIDEBAND_ERROR = 3
+GIT_SIDEBAND_CHANNELS = [GIT_SIDEBAND_DATA, GIT_SIDEBAND_PROGRESS, GIT_SIDEBAND_ERROR]
+
+
+def encode_packet(data):
+    """
+        Returns the given data (either string or bytes) as a pkt-line, prefixed with
+            it's length (including the prefix itself) in a 4 byte hex string.
+
+        e.g.
+            b'001e# service=git-upload-pack\n'
+    """
+
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if len(data) > GIT_PKTLINE_MAX_DATA_SIZE: raise ValueError('Packet data is longer than pkt-line limit.')
+
+    return '{0:04x}'.format(len(data) + GIT_PKTLINE_HEADER_SIZE).encode('ascii') + data
+
+
+def encode_sideband(channel, data):
+    """
+        Yields the given bytes data as pkt-lines on the given sideband channel, split into
+            as many packets as needed.
+    """
+
+    if not channel in GIT_SIDEBAND_CHANNELS: raise ValueError('Sideband channel is not a valid one.')
+
+    prefix, view = bytes([channel]), memoryview(data)
+    for start in range(0, len(view), GIT_PKTLINE_MAX_DATA_SIZE - 1):
+        yield encode_packet(prefix + view[start:start + GIT_PKTLINE_MAX_DATA_SIZE - 1])
+
+
+class PacketDecoder:
+    """
+        Incremental decoder of pkt-line streams. Input is fed chunk by chunk (as it's read from
+            a request or a git process) and complete packets are returned as soon as they're
+            available, so that a stream is never buffered as a whole.
+        Packets are returned as (kind, payload) pairs where payload is a memoryview over the fed
+            chunk (no copies are made) and it's empty for flush, delim and response-end packets.
+            Only a packet split between two chunks is copied to be joined.
+    """
+
+    def __init__(self):
+        self.pending = b''  # beginning of a packet split between chunks.
+
+
+    def _parse_length(self, view, offset):
+        """
+            Returns length of packet starting at 'offset' of the given view, which is it's header
+                size for special packets. Raises ValueError for malformed lengths.
+        """
+
+        try:
+            length = int(bytes(view[offset:offset + GIT_PKTLINE_HEADER_SIZE]), 16)
+        except ValueError:
+            raise ValueError('Packet length header is not a valid hex number.')
+
+        if length in GIT_PKTLINE_SPECIAL_PACKETS:
+            return GIT_PKTLINE_HEADER_SIZE
+        if length < GIT_PKTLINE_HEADER_SIZE or length > GIT_PKTLINE_MAX_SIZE:
+            raise ValueError('Packet length {0} is out of valid range.'.format(length))
+        return length
+
+
+    def _decode(self, view, packets):
+        """
+            Appends complete packets of the given view to 'packets' and returns offset of the
+                first byte which doesn't belong to a complete packet.
+        """
+
+        offset = 0
+        while len(view) - offset >= GIT_PKTLINE_HEADER_SIZE:
+            length = self._parse_length(view, offset)
+            if len(view) - offset < length:     # packet is not complete yet.
+                break
+
+            header = bytes(view[offset:offset + GIT_PKTLINE_HEADER_SIZE])
+            if length == GIT_PKTLINE_HEADER_SIZE and header != b'0004':
+                packets.append((GIT_PKTLINE_SPECIAL_PACKETS[int(header, 16)], view[offset:offset]))
+            else:
+                packets.append((GIT_PKTLINE_DATA, view[offset + GIT_PKTLINE_HEADER_SIZE:offset + length]))
+            offset = offset + length
+        return offset
+
+
+    def feed(self, chunk):
+        """
+            Returns a list of complete packets decoded from the given chunk (along with remainder
+                of previous chunks). Raises ValueError for malformed packets.
+        """
+
+        view, start, packets = memoryview(chunk), 0, []
+
+        if self.pending:    # complete pending packet with just as many bytes of chunk as it needs.
+            if len(self.pending) < GIT_PKTLINE_HEADER_SIZE:
+                start = GIT_PKTLINE_HEADER_SIZE - len(self.pending)
+                self.pending = self.pending + bytes(view[:start])
+                if len(self.pending) < GIT_PKTLINE_HEADER_SIZE:
+                    return packets
+
+            missing = self._parse_length(memoryview(self.pending), 0) - len(self.pending)
+            self.pending = self.pending + bytes(view[start:start + missing])
+            start = start + missing
+            if self._decode(memoryview(self.pending), packets) == 0:    # still not complete.
+                return packets
+            self.pending = b''
+
+        view = view[start:]
+        offset = self._decode(view, packets)
+        if offset < len(view):
+            self.pending = bytes(view[offset:])
+        return packets
+
+
+    def is_complete(self):
+        """
+            Returns true if all fed input is decoded, i.e. no partial packet is waiting for more input.
+        """
+
+        return len(self.pending) == 0
+
+
+def decode_packets(chunks):
+    """
+        Yields (kind, payload) packets of the given pkt-line stream, an iterable of bytes chunks.
+            Raises ValueError if stream ends in the middle of a packet.
+    """
+
+    decoder = PacketDecoder()
+    for chunk in chunks:
+        for packet in decoder.feed(chunk):
+            yield packet
+    if not decoder.is_complete(): raise ValueError('Packet stream ended with an incomplete packet.')
+
+
+def decode_sideband(packets):
+    """
+        Yields (channel, payload) pairs for the given data packets of a sideband multiplexed stream,
+            e.g. packfile data on channel 1 and progress messages on channel 2. Decoding stops at
+            the first flush packet.
+    """
+
+    for kind, payload in packets:
+        if kind == GIT_PKTLINE_FLUSH:
+            return
+        if kind != GIT_PKTLINE_DATA or len(payload) == 0 or not payload[0] in GIT_SIDEBAND_CHANNELS:
+            raise ValueError('Packet is not a valid sideband packet.')
+        yield payload[0], payload[1:]
@@ -0,0 +1,125 @@
+import re
+import logging
+from html import unescape
+
+import markdown
+from docutils.core import publish_parts
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.html import escape
+
+from git.object import GIT_BLOB_OBJECT, is_binary
+
+GIT_README_MARKDOWN = 'markdown'
+GIT_README_RESTRUCTUREDTEXT = 'restructuredtext'
+GIT_README_TEXT = 'text'
+
+# README file names in order of preference and their formats.
+GIT_README_NAMES = [('README.md', GIT_README_MARKDOWN), ('README.markdown', GIT_README_MARKDOWN),
+                    ('README.rst', GIT_README_RESTRUCTUREDTEXT), ('README.txt', GIT_README_TEXT), ('README', GIT_README_TEXT)]
+GIT_README_MARKDOWN_EXTENSIONS = ['markdown.extensions.fenced_code', 'markdown.extensions.tables']
+GIT_README_URL_SCHEMES = ['http', 'https', 'mailto']     # links and images of other schemes (e.g. 'javascript:') are dropped.
+GIT_README_TAG_PATTERN = re.compile(r'<[a-zA-Z][^>]*>')
+GIT_README_URL_ATTRIBUTE_PATTERN = re.compile(r'(\s(?:href|src)=)"([^"]*)"')
+GIT_URL_SCHEME_PATTERN = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):')
+GIT_README_DOCUTILS_SETTINGS = {
+    'raw_enabled': False,               # no raw html.
+    'file_insertion_enabled': False,    # no 'include' of server files.
+    'halt_level': 5,                    # never raise on errors, they're reported inline.
+    'report_level': 5,
+    '_disable_config': True,
+    'input_encoding': 'unicode',
+}
+
+logger = logging.getLogger('django')
+
+
+def find_readme(objects):
+    """
+        Returns the README blob among the given objects of a folder (by GIT_README_NAMES preference) or None.
+    """
+
+    blobs = {obj.get_path().rpartition('/')[2]: obj for obj in objects if obj.is_blob()}
+    for name, readme_format in GIT_README_NAMES:
+        if name in blobs:
+            return blobs[name]
+    return None
+
+
+def get_readme_format(name):
+    """
+        Returns format of a README by it's file name.
+    """
+
+    return dict(GIT_README_NAMES).get(name, GIT_README_TEXT)
+
+
+def is_safe_url(url):
+    """
+        Returns true if the given (html escaped) url is relative, a fragment or of GIT_README_URL_SCHEMES.
+            Control characters and whitespace are ignored, just like browsers do in schemes.
+    """
+
+    scheme = GIT_URL_SCHEME_PATTERN.match(re.sub(r'[\x00-\x20\x7f]', '', unescape(url)))
+    return scheme is None or scheme.group(1).lower() in GIT_README_URL_SCHEMES
+
+
+def sanitize_urls(html):
+    """
+        Empties 'href' and 'src' attributes of rendered html which aren't safe urls. Renderers escape
+            '<', '>' and '"' in text and attributes, so every '<' starts a tag they've generated.
+    """
+
+    def _sanitize_attribute(attribute):
+        return attribute.group(0) if is_safe_url(attribute.group(2)) else '{0}""'.format(attribute.group(1))
+
+    return GIT_README_TAG_PATTERN.sub(lambda tag: GIT_README_URL_ATTRIBUTE_PATTERN.sub(_sanitize_attribute, tag.group(0)), html)
+
+
+def render(content, readme_format):
+    """
+        Renders README text content to safe html. Raw html of Markdown is escaped, reStructuredText
+            is rendered without raw html and file inclusion directives and urls of links and images
+            are limited to safe schemes in both.
+    """
+
+    if readme_format == GIT_README_MARKDOWN:
+        html = markdown.markdown(content, safe_mode='escape', extensions=GIT_README_MARKDOWN_EXTENSIONS)
+    elif readme_format == GIT_README_RESTRUCTUREDTEXT:
+        html = publish_parts(content, writer_name='html', settings_overrides=GIT_README_DOCUTILS_SETTINGS)['html_body']
+    else:
+        return '<pre>{0}</pre>'.format(escape(content))
+    return sanitize_urls(html)
+
+
+def render_readme(blob):
+    """
+        Returns a dict of README blob's 'name' and rendered 'html' or None if it can't be shown (e.g. it's
+            binary or larger than settings.GIT_BLOB_PREVIEW_SIZE). Rendered html is cached by blob's SHA-1
+            hash, so each version of a README is rendered only once. It's kept in the small 'readme'
+            cache, apart from the default one, since each entry can be large.
+    """
+
+    if blob is None:
+        return None
+
+    info = blob.get_info()
+    if info is None or info[1] > settings.GIT_BLOB_PREVIEW_SIZE:
+        return None
+
+    name = blob.get_path().rpartition('/')[2]
+    readme_format = get_readme_format(name)
+    key = 'git-readme-html:{0}:{1}'.format(info[0], readme_format)
+    html = caches['readme'].get(key)
+    if html is None:
+        content = blob.get_repo().read_object(info[0])
+        if content is None or content[1] != GIT_BLOB_OBJECT or is_binary(content[3]):
+            return None
+        try:
+            html = render(str(content[3], 'utf-8', 'replace'), readme_format)
+        except Exception as e:
+            logger.error('RENDER_README -> ERR ({0}: {1})'.format(blob, e))
+            html = render(str(content[3], 'utf-8', 'replace'), GIT_README_TEXT)
+        caches['readme'].set(key, html, settings.GIT_HISTORY_CACHE_TIMEOUT)
+
+    return {'name': name, 'html': html}
@@ -0,0 +1,185 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+GIT_HEAD = 'HEAD'
+GIT_REFS_PREFIX = 'refs/'
+GIT_REFS_HEADS = 'refs/heads/'
+GIT_REFS_TAGS = 'refs/tags/'
+GIT_REFS_REMOTES = 'refs/remotes/'
+GIT_SYMREF_PREFIX = 'ref: '
+GIT_SYMREF_MAX_DEPTH = 5    # same limit as git for chains of symbolic refs.
+GIT_SHA1_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+
+# Short names of revisions are looked up under these prefixes, in the same order as 'git rev-parse'.
+GIT_REV_PREFIXES = ['', GIT_REFS_PREFIX, GIT_REFS_TAGS, GIT_REFS_HEADS, GIT_REFS_REMOTES]
+
+GIT_REFS_CACHE_SIZE = 256   # number of repositories whose refs are kept in memory by each worker.
+
+
+class GitRefs:
+    """
+        A snapshot of a repository's references read directly from it's files ('HEAD', loose refs
+            under 'refs/' and 'packed-refs'), without running any git command.
+        'refs' maps full reference names (e.g. 'refs/heads/master') to SHA-1 hashes, with symbolic
+            references resolved. 'peeled' maps annotated tags to the objects they point to, when
+            'packed-refs' records them. 'head' is the target of HEAD ('refs/heads/master' when it's
+            symbolic or a SHA-1 hash when it's detached).
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self.refs = {}
+        self.peeled = {}
+        self.head = None
+        self._read()
+
+
+    def _read_file(self, path):
+        """
+            Returns stripped content of a reference file or None if it's missing.
+        """
+
+        try:
+            with open(path, 'r', encoding='utf-8') as ref_file:
+                return ref_file.read().strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+
+    def _read(self):
+        """
+            Reads 'packed-refs', then loose references (which take precedence) and HEAD.
+        """
+
+        values, previous = {}, None
+        for line in (self._read_file(os.path.join(self.location, 'packed-refs')) or '').split('\n'):
+            if line.startswith('^') and previous is not None:
+                self.peeled[previous] = line[1:].strip()
+            elif line != '' and not line.startswith('#'):
+                sha1_hash, _, name = line.partition(' ')
+                values[name], previous = sha1_hash, name
+
+        refs_root = os.path.join(self.location, 'refs')
+        for root, folders, files in os.walk(refs_root):
+            for name in files:
+                if name.endswith('.lock'):
+                    continue
+                value = self._read_file(os.path.join(root, name))
+                if value is not None:
+                    ref = os.path.relpath(os.path.join(root, name), self.location).replace(os.sep, '/')
+                    values[ref] = value
+
+        self.head = self._read_file(os.path.join(self.location, GIT_HEAD))
+        if self.head is not None and self.head.startswith(GIT_SYMREF_PREFIX):
+            self.head = self.head[len(GIT_SYMREF_PREFIX):]
+
+        for name in values:
+            sha1_hash = self._resolve_value(values, values[name])
+            if sha1_hash is not None:
+                self.refs[name] = sha1_hash
+
+
+    def _resolve_value(self, values, value):
+        """
+            Returns SHA-1 hash a reference value points to, following symbolic references.
+        """
+
+        for depth in range(GIT_SYMREF_MAX_DEPTH):
+            if value is None or GIT_SHA1_PATTERN.match(value):
+                return value
+            if not value.startswith(GIT_SYMREF_PREFIX):
+                return None
+            value = values.get(value[len(GIT_SYMREF_PREFIX):])
+        return None
+
+
+    def get_branches(self):
+        """
+            Returns names of all branches, sorted.
+        """
+
+        return sorted(name[len(GIT_REFS_HEADS):] for name in self.refs if name.startswith(GIT_REFS_HEADS))
+
+
+    def get_tags(self):
+        """
+            Returns names of all tags, sorted.
+        """
+
+        return sorted(name[len(GIT_REFS_TAGS):] for name in self.refs if name.startswith(GIT_REFS_TAGS))
+
+
+    def get_head(self):
+        """
+            Returns short name of HEAD, which is the name of it's branch or 'HEAD' if it's detached or
+                it's branch has no commits yet, just like 'git rev-parse --abbrev-ref HEAD'.
+        """
+
+        if self.head is not None and self.head.startswith(GIT_REFS_HEADS) and self.head in self.refs:
+            return self.head[len(GIT_REFS_HEADS):]
+        return GIT_HEAD
+
+
+    def resolve(self, rev):
+        """
+            Returns SHA-1 hash of a revision given as 'HEAD', a full SHA-1 hash or a (short or full)
+                reference name, or None if it's unknown. SHA-1 hashes are returned as is, their
+                existence is not checked here.
+        """
+
+        if rev == GIT_HEAD:
+            return self.head if self.head is not None and GIT_SHA1_PATTERN.match(self.head) else self.refs.get(self.head)
+        if GIT_SHA1_PATTERN.match(rev):
+            return rev
+        for prefix in GIT_REV_PREFIXES:
+            if prefix + rev in self.refs:
+                return self.refs[prefix + rev]
+        return None
+
+
+class GitRefsCache:
+    """
+        A per-worker cache of references snapshots keyed by repository location. Each snapshot is
+            kept along with the references fingerprint of repository (see 'Repo.get_refs_fingerprint')
+            it was read at and it's read again only when fingerprint changes, so unchanged repositories
+            cost a few 'stat' calls. Least recently used snapshots are evicted past GIT_REFS_CACHE_SIZE.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshots = OrderedDict()
+
+
+    def get(self, repo):
+        """
+            Returns an up to date references snapshot of the given repository.
+        """
+
+        fingerprint = repo.get_refs_fingerprint()
+        with self.lock:
+            cached = self.snapshots.get(repo.location)
+            if cached is not None and cached[0] == fingerprint:
+                self.snapshots.move_to_end(repo.location)
+                return cached[1]
+
+        refs = GitRefs(repo.location)
+        with self.lock:
+            self.snapshots[repo.location] = (fingerprint, refs)
+            self.snapshots.move_to_end(repo.location)
+            while len(self.snapshots) > GIT_REFS_CACHE_SIZE:
+                self.snapshots.popitem(last=False)
+        return refs
+
+
+    def discard(self, location):
+        """
+            Removes references snapshot of a repository, e.g. after it's deleted.
+        """
+
+        with self.lock:
+            self.snapshots.pop(location, None)
+
+
+refs_cache = GitRefsCache()
@@ -1,10 +1,33 @@
 import os
+import zlib
+import fcntl
+import shlex
+import hashlib
+import logging
 
 from django.conf import settings
+from django.core.cache import cache
 
-from git.object import GIT_BLOB_OBJECT, GIT_TREE_OBJECT, GitTree, GitBlob, GitCommit
-from utils.system import run_command
-from utils.date import time_to_utc
+from git.object import GIT_BLOB_OBJECT, GIT_TREE_OBJECT, GIT_COMMIT_OBJECT, GIT_LOG_FORMAT, GIT_LOG_FIELDS, \
+                            GitTree, GitBlob, GitCommit, parse_tree, parse_commit, parse_log_record
+from git.catfile import GIT_CATFILE_BATCH, GIT_CATFILE_BATCH_CHECK, catfile_pool
+from git.refs import GIT_HEAD, GIT_SHA1_PATTERN, refs_cache
+from git.odb import object_stores
+from git.service import GIT_SERVICES, GIT_PROTOCOL_VERSIONS, get_git_protocol_version
+from utils.system import run_command, execute_command, stream_command, iter_lines
+from utils.date import timestamp_to_utc
+
+GIT_MAINTENANCE_LOCK = os.path.join('djacket', 'maintenance.lock')     # held while maintenance of repository runs.
+
+# Configuration of repositories, so git reads commit-graph files (and their changed-path Bloom filters)
+#   in history walks and keeps writing them on it's own garbage collections.
+GIT_REPOSITORY_CONFIG = [('core.commitGraph', 'true'), ('commitGraph.readChangedPaths', 'true'),
+                            ('gc.writeCommitGraph', 'true')]
+
+GIT_TAG_OBJECT = 'tag'
+GIT_PEEL_SUFFIXES = [('^{commit}', GIT_COMMIT_OBJECT), ('^{tree}', GIT_TREE_OBJECT)]
+
+logger = logging.getLogger('django')
 
 
 class Repo:
@@ -17,6 +40,7 @@ class Repo:
 
     def __init__(self, location):
         self.location = location
+        self.validity = None    # (directory signature, validity) of the latest validity check.
 
 
     @staticmethod
@@ -28,13 +52,164 @@ class Repo:
         return os.path.join(settings.GIT_DEPOSIT_ROOT, username, '{0}.git'.format(repository))
 
 
-    def is_valid(self):
+    @staticmethod
+    def parse_repository_location(location):
+        """
+            Returns (username, repository) of the given repository location in server storage,
+                reverse of 'get_repository_location' static method.
+        """
+
+        folder, name = os.path.split(os.path.normpath(location))
+        return os.path.basename(folder), name[:-len('.git')] if name.endswith('.git') else name
+
+
+    def _get_signature(self):
+        """
+            Returns a signature of repository directory which changes whenever directory is
+                replaced or it's entries change. Returns None if directory does not exist.
+        """
+
+        try:
+            stat = os.stat(self.location)
+            return stat.st_ino, stat.st_mtime_ns
+        except OSError:
+            return None
+
+
+    def is_valid(self, revalidate=True):
         """
             Validity property to see if a git repository is available in the given location for object.
+                Result is memoized and it's checked again only when repository directory changes.
+                If 'revalidate' is False a memoized result is returned without checking directory at all.
+        """
+
+        if self.validity is not None and not revalidate:
+            return self.validity[1]
+
+        signature = self._get_signature()
+        if self.validity is None or self.validity[0] != signature:
+            valid = signature is not None and \
+                        len(run_command(cmd='git rev-parse', data=None, location=self.location, chw=True)) == 0
+            self.validity = (signature, valid)
+        return self.validity[1]
+
+
+    def _read_native(self, name, header_only=False):
+        """
+            Reads an object natively (see 'git.odb.GitObjectStore'), by a name which is a revision
+                ('HEAD', a reference or a full SHA-1 hash), optionally peeled with '^{commit}' or
+                '^{tree}' or followed by ':path/in/tree'. Returns (sha1_hash, kind, size, content)
+                (content is None with 'header_only'), False if object is certainly missing or None if
+                it can't be read natively (other name syntaxes, objects of alternates, corrupt files),
+                then it should be read by git.
         """
 
-        git_rev_parse = run_command(cmd='git rev-parse', data=None, location=self.location, chw=True)
-        return len(git_rev_parse) == 0
+        peel = None
+        for suffix, kind in GIT_PEEL_SUFFIXES:
+            if name.endswith(suffix):
+                name, peel = name[:-len(suffix)], kind
+        rev, has_path, path = name.partition(':')
+        if has_path and peel is not None:
+            return None
+        sha1_hash = rev if GIT_SHA1_PATTERN.match(rev) else self.get_refs().resolve(rev)
+        if sha1_hash is None:
+            return False if rev == GIT_HEAD else None   # HEAD of an empty repository.
+
+        store = object_stores.get(self.location)
+        try:
+            if header_only and not has_path and peel is None:
+                obj = store.read_header(sha1_hash)
+            else:
+                obj = store.read(sha1_hash)
+                while obj is not None and obj[0] == GIT_TAG_OBJECT and (has_path or peel is not None):
+                    sha1_hash = bytes(obj[2][7:47]).decode('ascii')     # first line is 'object <sha1_hash>'.
+                    obj = store.read(sha1_hash)
+            if obj is None:
+                return None
+
+            if (has_path or peel == GIT_TREE_OBJECT) and obj[0] == GIT_COMMIT_OBJECT:
+                sha1_hash = bytes(obj[2][5:45]).decode('ascii')     # first line is 'tree <sha1_hash>'.
+                obj = store.read(sha1_hash)
+            elif peel is not None and obj[0] != peel:
+                return False
+
+            for entry_name in path.split('/') if path != '' else []:
+                if obj is None or obj[0] != GIT_TREE_OBJECT or entry_name in ['', '.', '..']:
+                    return None
+                entry = next((entry for entry in parse_tree(obj[2]) if entry[2] == entry_name), None)
+                if entry is None:
+                    return False
+                sha1_hash = entry[1]
+                obj = store.read_header(sha1_hash) if header_only and entry[0] == GIT_BLOB_OBJECT else store.read(sha1_hash)
+
+            if obj is None:
+                return None
+            return (sha1_hash, obj[0], obj[1], None if header_only else obj[2])
+        except (OSError, ValueError, IndexError, zlib.error) as e:
+            logger.error('READ_OBJECT -> ERR ({0}: {1})'.format(self.location, e))
+            return None
+
+
+    def read_object(self, name):
+        """
+            Reads an object by it's name (e.g. a SHA-1 hash or 'HEAD:path/to/file') and returns
+                (sha1_hash, kind, size, content) or None if missing. Objects are read natively from
+                packfiles and loose objects if possible, then content is a memoryview, or else through
+                a pooled 'git cat-file --batch' process.
+        """
+
+        obj = self._read_native(name)
+        if obj is None:
+            return catfile_pool.get(self.location, GIT_CATFILE_BATCH).query(name)
+        return obj or None
+
+
+    def get_object_info(self, name):
+        """
+            Returns (sha1_hash, kind, size) of an object by it's name, read natively if possible or
+                else through a pooled 'git cat-file --batch-check' process, or None if object is missing.
+        """
+
+        info = self._read_native(name, header_only=True)
+        if info is None:
+            info = catfile_pool.get(self.location, GIT_CATFILE_BATCH_CHECK).query(name)
+        return info[:3] if info else None
+
+
+    def read_blob_head(self, sha1_hash, size):
+        """
+            Returns at most first 'size' bytes of a blob's content. It's read natively if possible,
+                inflating only as much of it as needed, or else from beginning of 'git cat-file blob' output.
+        """
+
+        try:
+            blob = object_stores.get(self.location).read_head(sha1_hash, size)
+        except (OSError, ValueError, IndexError, zlib.error) as e:
+            logger.error('READ_BLOB_HEAD -> ERR ({0}: {1})'.format(self.location, e))
+            blob = None
+        if blob is not None:
+            return blob[2]
+
+        chunks, read = [], 0
+        git_output = self.stream_blob(sha1_hash)
+        try:
+            for chunk in git_output:
+                chunks.append(chunk)
+                read = read + len(chunk)
+                if read >= size:
+                    break
+        finally:
+            git_output.close()
+        return b''.join(chunks)[:size]
+
+
+    def stream_blob(self, sha1_hash):
+        """
+            Returns a generator of a blob's content in chunks, read by 'git cat-file blob'.
+        """
+
+        return stream_command(cmd='git cat-file blob {0}'.format(shlex.quote(sha1_hash)), data=None,
+                                location=self.location, chw=True)
 
 
     def init_bare_repo(self):
@@ -46,6 +221,25 @@ class Repo:
         if not os.path.exists(expected_location):
             os.makedirs(expected_location)
             run_command(cmd='git init --bare', data=None, location=expected_location, chw=False)
+            self.configure()
+
+
+    def configure(self):
+        """
+            Sets GIT_REPOSITORY_CONFIG options on repository. Returns true on success.
+        """
+
+        return all(execute_command(cmd='git config {0} {1}'.format(name, value), location=self.location, chw=True)
+                    for name, value in GIT_REPOSITORY_CONFIG)
+
+
+    @staticmethod
+    def get_protocol_env(protocol):
+        """
+            Returns environment variables for passing the given wire protocol parameters to git services.
+        """
+
+        return None if protocol is None else {'GIT_PROTOCOL': protocol}
 
 
     def commit(self, payload):
@@ -64,49 +258,260 @@ class Repo:
         return run_command(cmd='git upload-pack --stateless-rpc', data=payload, location=self.location, chw=False)
 
 
+    def commit_stream(self, payload, protocol=None):
+        """
+            Same as 'commit' but returns a generator over 'git receive-pack' output chunks.
+                Payload can be either bytes or an iterable of bytes chunks.
+                Requested wire protocol parameters (e.g. 'version=2') are passed to git in 'protocol'.
+        """
+
+        return stream_command(cmd='git receive-pack --stateless-rpc', data=payload, location=self.location, chw=False,
+                    env=self.get_protocol_env(protocol))
+
+
+    def pull_stream(self, payload, protocol=None):
+        """
+            Same as 'pull' but returns a generator over 'git upload-pack' output chunks,
+                so packfile is never buffered as a whole in memory.
+                Requested wire protocol parameters (e.g. 'version=2') are passed to git in 'protocol'.
+        """
+
+        return stream_command(cmd='git upload-pack --stateless-rpc', data=payload, location=self.location, chw=False,
+                    env=self.get_protocol_env(protocol))
+
+
     def get_last_update(self):
         """
             Returns latest update date of repository in "ISO 8601-like" format and 'UTC' timezone.
         """
 
+        timestamp = self.get_last_update_timestamp()
+        return None if timestamp is None else timestamp_to_utc(timestamp)
+
+
+    def get_last_update_timestamp(self):
+        """
+            Returns latest update date of repository (author date of HEAD commit) as a unix timestamp
+                or None if repository has no commits.
+        """
+
         if not os.path.exists(self.location):
             return None
 
-        git_output = run_command(cmd='git log -1 --format="%ai"', data=None, location=self.location, chw=True)
-        if git_output is None or len(git_output) == 0:
+        head = self.read_object('HEAD')
+        if head is None or head[1] != GIT_COMMIT_OBJECT:
             return None
-        return time_to_utc(git_output.strip())
+        return parse_commit(head[3])['author_time']
+
+
+    def get_refs_fingerprint(self):
+        """
+            Returns a cheap fingerprint of repository references state, made of modification times of
+                'HEAD', 'packed-refs' and everything under 'refs/' folder. Any reference update
+                (which git does by renaming a lock file over the reference) changes it.
+        """
+
+        fingerprint = hashlib.sha1()
+        for name in ['HEAD', 'packed-refs']:
+            try:
+                stat = os.stat(os.path.join(self.location, name))
+                fingerprint.update('{0}:{1}:{2};'.format(name, stat.st_ino, stat.st_mtime_ns).encode('utf-8'))
+            except OSError:
+                fingerprint.update('{0}:-;'.format(name).encode('utf-8'))
+
+        for root, folders, files in os.walk(os.path.join(self.location, 'refs')):
+            folders.sort()
+            for name in [''] + sorted(files):
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:     # reference is removed while walking.
+                    continue
+                path = os.path.relpath(os.path.join(root, name), self.location)
+                fingerprint.update('{0}:{1}:{2};'.format(path, stat.st_ino, stat.st_mtime_ns).encode('utf-8'))
+        return fingerprint.hexdigest()
+
+
+    def _get_info_refs_cache_key(self, service, version):
+        """
+            Returns cache key of 'refs' advertisement of the repository for the given service and protocol version.
+        """
+
+        return 'git-info-refs:{0}:{1}:v{2}'.format(hashlib.sha1(self.location.encode('utf-8')).hexdigest(), service, version)
+
+
+    def get_info_refs(self, service, protocol=None):
+        """
+            Returns 'refs' object information of the repository according to the given service
+                and requested wire protocol parameters (e.g. 'version=2'). In protocol v2 only
+                server capabilities are advertised and refs are listed later by 'ls-refs' command.
+            Advertisement is cached along with references fingerprint, so that polling
+                an unchanged repository doesn't run git at all.
+        """
+
+        env = self.get_protocol_env(protocol)
+        if not service in GIT_SERVICES:
+            return run_command(cmd='{0} --stateless-rpc --advertise-refs'.format(service),
+                        data=None, location=self.location, chw=False, env=env)
+
+        key, fingerprint = self._get_info_refs_cache_key(service, get_git_protocol_version(protocol)), self.get_refs_fingerprint()
+        cached = cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        info_refs = run_command(cmd='{0} --stateless-rpc --advertise-refs'.format(service),
+                        data=None, location=self.location, chw=False, env=env)
+        if fingerprint == self.get_refs_fingerprint():  # references didn't change while git was running.
+            cache.set(key, (fingerprint, info_refs), settings.GIT_INFO_REFS_CACHE_TIMEOUT)
+        return info_refs
+
+
+    def clear_info_refs(self):
+        """
+            Removes cached 'refs' advertisements of the repository, e.g. after a push.
+        """
+
+        cache.delete_many([self._get_info_refs_cache_key(service, version)
+                                for service in GIT_SERVICES for version in GIT_PROTOCOL_VERSIONS])
 
 
-    def get_info_refs(self, service):
+    def get_packs_count(self):
         """
-            Returns 'refs' object information of the repository according to the given service.
+            Returns number of packfiles of repository.
         """
 
-        return run_command(cmd='{0} --stateless-rpc --advertise-refs'.format(service),
-                    data=None, location=self.location, chw=False)
+        try:
+            return len([name for name in os.listdir(os.path.join(self.location, 'objects', 'pack')) if name.endswith('.pack')])
+        except OSError:
+            return 0
+
+
+    def has_bitmap(self):
+        """
+            Returns true if repository has a reachability bitmap index for it's packfiles.
+        """
+
+        try:
+            return any(name.endswith('.bitmap') for name in os.listdir(os.path.join(self.location, 'objects', 'pack')))
+        except OSError:
+            return False
+
+
+    def repack(self, full=False):
+        """
+            Packs loose objects of repository into a new packfile and removes redundant ones. If 'full'
+                is True all packfiles are combined into a single one along with a bitmap index,
+                which speeds up counting objects for clones and fetches. Returns true on success.
+        """
+
+        if full:
+            return execute_command(cmd='git repack -a -d -q --write-bitmap-index', location=self.location, chw=True)
+        return execute_command(cmd='git repack -d -q', location=self.location, chw=True)
+
+
+    def write_commit_graph(self):
+        """
+            Writes commit-graph of all reachable commits along with changed-path Bloom filters, which
+                speed up history walks (e.g. 'git log') and let path-limited ones (e.g. 'git log -- path')
+                skip commits not touching the path without reading their trees. Graph is written
+                incrementally as a new layer, merged with others by git when they grow.
+                Returns true on success.
+        """
+
+        return execute_command(cmd='git commit-graph write --reachable --split --changed-paths',
+                                location=self.location, chw=True)
+
+
+    def maintain(self, full=None):
+        """
+            Runs maintenance of repository: configures it, repacks it (fully if it has too many packfiles
+                or no bitmap index yet, unless 'full' is given) and writes it's commit-graph. Returns true on success,
+                or None if another maintenance of repository is already running.
+        """
+
+        path = os.path.join(self.location, GIT_MAINTENANCE_LOCK)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            if full is None:
+                full = self.get_packs_count() > settings.GIT_MAINTENANCE_MAX_PACKS or not self.has_bitmap()
+            return self.configure() and self.repack(full) and self.write_commit_graph()
 
 
     def get_latest_status(self):
         """
-            Returns a status message of repository latest commit.
+            Returns status of repository latest commit as a dict of it's 'committer', abbreviated 'sha1_hash'
+                and committer 'date' ("ISO 8601-like" format in 'UTC' timezone, relative age is shown by
+                client) or None if repository is empty.
 
             e.g.
-                'John Smith committed 9ece390, 2 hours ago'
+                {'committer': 'John Smith', 'sha1_hash': '9ece390', 'date': '2017-08-22T10:43:51+0000'}
+        """
+
+        head = self.read_object('HEAD')
+        if head is None or head[1] != GIT_COMMIT_OBJECT:
+            return None
+
+        commit = parse_commit(head[3])
+        return {'committer': commit['committer_name'], 'sha1_hash': head[0][:7],
+                'date': timestamp_to_utc(commit['committer_time'])}
+
+
+    def get_commits(self, rev, skip=0, limit=None):
+        """
+            Returns commits of the given revision. A page of commits can be requested
+                by skipping 'skip' commits and returning at most 'limit' commits.
+        """
+
+        return list(self.iter_commits(rev, skip, limit))
+
+
+    def iter_commits(self, rev, skip=0, limit=None):
+        """
+            Yields commits of the given revision with all of their metadata parsed
+                from a single streamed 'git log' pass, so commit accessors run no git command.
+            History is only walked as far as requested page needs, so pages cost the same
+                regardless of history length.
         """
 
-        return run_command(cmd='git log -1 --format="%cn committed %h, %cr"', data=None, location=self.location, chw=True)
+        cmd = 'git log --format={0} --skip={1}'.format(GIT_LOG_FORMAT, int(skip))
+        if limit is not None:
+            cmd = '{0} --max-count={1}'.format(cmd, int(limit))
 
+        git_output = stream_command(cmd='{0} {1}'.format(cmd, shlex.quote(rev)), data=None, location=self.location, chw=True)
+        try:
+            for line in iter_lines(git_output):
+                commit = parse_log_record(line)
+                yield GitCommit(repo=self, sha1_hash=commit['sha1_hash'], rev=rev, data=commit)
+        finally:
+            git_output.close()
 
-    def get_commits(self, rev):
+
+    def iter_commit_timestamps(self, revisions):
         """
-            Returns all commits in all branches for this repository.
+            Yields committer unix timestamps of commits in the given revisions range (e.g. 'master' or 'a1b2..c3d4').
         """
 
-        git_output = run_command(cmd='git log {0} --format="%H"'.format(rev),
-                                    data=None, location=self.location, chw=True).split('\n')[:-1]
+        git_output = stream_command(cmd='git log --format=%ct {0}'.format(shlex.quote(revisions)),
+                                        data=None, location=self.location, chw=True)
+        try:
+            for line in iter_lines(git_output):
+                yield int(line)
+        finally:
+            git_output.close()
+
+
+    def is_ancestor(self, ancestor, descendant):
+        """
+            Returns true if 'ancestor' commit is reachable from 'descendant' commit.
+        """
 
-        return [GitCommit(repo=self, sha1_hash=commit, rev=rev) for commit in git_output]
+        git_output = run_command(cmd='git merge-base {0} {1}'.format(shlex.quote(ancestor), shlex.quote(descendant)),
+                                    data=None, location=self.location, chw=True)
+        return git_output.strip() == ancestor
 
 
     def get_contributers(self):
@@ -117,14 +522,29 @@ class Repo:
         return None
 
 
+    def get_refs(self):
+        """
+            Returns references of repository (a GitRefs snapshot), read from it's files and cached
+                until they change, so no git command is run for them.
+        """
+
+        return refs_cache.get(self)
+
+
     def get_branches(self):
         """
             Returns all branches for this repository.
         """
 
-        result = run_command(cmd='git branch', data=None, location=self.location, chw=True).split('\n')[:-1]
-        branches = [item[2:] for item in result]
-        return branches
+        return self.get_refs().get_branches()
+
+
+    def get_tags(self):
+        """
+            Returns all tags for this repository.
+        """
+
+        return self.get_refs().get_tags()
 
 
     def get_head(self):
@@ -132,8 +552,20 @@ class Repo:
             Returns HEAD revision for this repository.
         """
 
-        return run_command(cmd='git rev-parse --abbrev-ref HEAD', data=None,
-                    location=self.location, chw=True).split('\n')[:-1][0]
+        return self.get_refs().get_head()
+
+
+    def resolve_rev(self, rev):
+        """
+            Returns SHA-1 hash of the given revision ('HEAD', a branch, a tag or a full SHA-1 hash of an
+                existing commit) or None if there's no such revision.
+        """
+
+        sha1_hash = self.get_refs().resolve(rev)
+        if sha1_hash is not None and sha1_hash == rev:
+            info = self.get_object_info(sha1_hash)
+            return sha1_hash if info is not None and info[1] == GIT_COMMIT_OBJECT else None
+        return sha1_hash
 
 
     def ls_tree(self, recursive, rev='HEAD'):
@@ -142,18 +574,128 @@ class Repo:
                 Returns a list of GitTree/GitBlob objects representing contents.
         """
 
-        r = '-r' if recursive else ''   # if recursive is set to 'True' then a '-r' option is added to command.
-        cmd = 'git ls-tree --full-tree {0} {1}'.format(r, rev)
-        git_output = run_command(cmd=cmd, data=None, location=self.location, chw=True).split('\n')[:-1]
-
         tree_contents = []
-        for item in git_output:
-            kind, path = item.split()[1], '{0}'.format(item.split()[3])
+        self._walk_tree('{0}^{{tree}}'.format(rev), '', recursive, rev, tree_contents)
+        self.set_last_commits(tree_contents, rev, '')
+        return tree_contents
+
+
+    def _walk_tree(self, name, prefix, recursive, rev, tree_contents):
+        """
+            Appends entries of the given tree object to 'tree_contents'. In recursive mode only blobs
+                are listed and subtrees are walked in place, just like 'git ls-tree -r'.
+        """
+
+        tree = self.read_object(name)
+        if tree is None or tree[1] != GIT_TREE_OBJECT:
+            return
+
+        for kind, sha1_hash, entry_name in parse_tree(tree[3]):
+            path = '{0}{1}'.format(prefix, entry_name)
             if kind == GIT_BLOB_OBJECT:
                 tree_contents.append(GitBlob(repo=self, path=path, rev=rev))
+            elif kind == GIT_TREE_OBJECT and recursive:
+                self._walk_tree(sha1_hash, '{0}/'.format(path), recursive, rev, tree_contents)
             elif kind == GIT_TREE_OBJECT:
                 tree_contents.append(GitTree(repo=self, path=path, rev=rev))
-        return tree_contents
+
+
+    def get_last_commit(self, rev, path):
+        """
+            Returns latest commit touching the given path in revision's history or None if there's not any.
+                It's a single path-limited 'git log' query, which is answered from changed-path Bloom
+                filters of commit-graph when repository has them. Results are cached by revision's
+                commit SHA-1 hash and path, since they never change for a commit.
+        """
+
+        commit = self.get_object_info('{0}^{{commit}}'.format(rev))
+        if commit is None:
+            return None
+
+        key = 'git-last-commit:{0}:{1}'.format(commit[0], hashlib.sha1(path.encode('utf-8')).hexdigest())
+        last_commit = cache.get(key)
+        if last_commit is None:
+            record = run_command(cmd='git log -1 --format={0} {1} -- {2}'.format(GIT_LOG_FORMAT, commit[0], shlex.quote(path)),
+                                    data=None, location=self.location, chw=True).rstrip('\n')
+            last_commit = parse_log_record(record.encode('utf-8')) if record != '' else {}
+            cache.set(key, last_commit, settings.GIT_HISTORY_CACHE_TIMEOUT)
+
+        if not last_commit:
+            return None
+        return GitCommit(repo=self, sha1_hash=last_commit['sha1_hash'], rev=rev, data=last_commit)
+
+
+    def set_last_commits(self, objects, rev, path):
+        """
+            Resolves latest commits of the given blobs/trees (all located inside 'path' folder)
+                at once and attaches them to objects, so their commit accessors run no git command.
+        """
+
+        last_commits = self.get_last_commits(rev, path, [obj.get_path() for obj in objects])
+        for obj in objects:
+            obj.last_commit = last_commits.get(obj.get_path())
+
+
+    def get_last_commits(self, rev, path, paths):
+        """
+            Returns a dict of latest commit touching each of the given paths inside 'path' folder.
+                All paths are resolved in a single history walk and results are cached by
+                revision's commit SHA-1 hash and folder path, since they never change for a commit.
+        """
+
+        commit = self.get_object_info('{0}^{{commit}}'.format(rev))
+        if commit is None or len(paths) == 0:
+            return {}
+
+        key = 'git-last-commits:{0}:{1}'.format(commit[0], hashlib.sha1(path.encode('utf-8')).hexdigest())
+        last_commits = cache.get(key, {})
+        remaining = set(paths).difference(last_commits)
+        if len(remaining) > 0:
+            last_commits.update(self._walk_last_commits(commit[0], path, remaining))
+            cache.set(key, last_commits, settings.GIT_HISTORY_CACHE_TIMEOUT)
+
+        return {p: GitCommit(repo=self, sha1_hash=last_commits[p]['sha1_hash'], rev=rev, data=last_commits[p])
+                    for p in paths if last_commits.get(p) is not None}
+
+
+    def _walk_last_commits(self, rev, path, paths):
+        """
+            Walks history of 'path' folder once and returns parsed latest commit for each of the given paths.
+                Walk stops as soon as all paths are resolved. A changed file resolves itself and all of
+                it's parent folders. Paths not found in history are mapped to None.
+            Output is NUL separated ('-z'), so names are never quoted: each commit is a record of it's
+                fields (the first one marked with '\\x01') followed by names of changed files, the first
+                of which starts with a newline.
+        """
+
+        cmd = 'git log -c -z --name-only --format=%x01{0} {1}'.format(GIT_LOG_FORMAT, rev)
+        if path != '':
+            cmd = '{0} -- {1}'.format(cmd, shlex.quote(path))
+
+        remaining, last_commits = set(paths), {p: None for p in paths}
+        commit, fields, first = None, None, False
+        git_output = stream_command(cmd=cmd, data=None, location=self.location, chw=True)
+        try:
+            for token in iter_lines(git_output, b'\0'):
+                if fields is not None:
+                    fields.append(token)
+                    if len(fields) == len(GIT_LOG_FIELDS):
+                        commit, fields, first = parse_log_record(b'\0'.join(fields)), None, True
+                elif token.startswith(b'\x01'):
+                    fields = [token[1:]]
+                elif commit is not None:
+                    changed = (token[1:] if first and token.startswith(b'\n') else token).decode('utf-8', 'replace')
+                    first = False
+                    while changed != '' and changed != path:
+                        if changed in remaining:
+                            last_commits[changed] = commit
+                            remaining.discard(changed)
+                        changed = changed.rpartition('/')[0]
+                    if len(remaining) == 0:
+                        break
+        finally:
+            git_output.close()
+        return last_commits
 
 
     def __str__(self):
@@ -1,7 +1,16 @@
+import re
+
 GIT_SERVICE_UPLOAD_PACK = 'git-upload-pack'
 GIT_SERVICE_RECEIVE_PACK = 'git-receive-pack'
 GIT_SERVICES = [GIT_SERVICE_UPLOAD_PACK, GIT_SERVICE_RECEIVE_PACK]
 
+# Wire protocol versions which are passed through to git services, by 'Git-Protocol' http header.
+GIT_PROTOCOL_V0 = 0
+GIT_PROTOCOL_V1 = 1
+GIT_PROTOCOL_V2 = 2
+GIT_PROTOCOL_VERSIONS = [GIT_PROTOCOL_V0, GIT_PROTOCOL_V1, GIT_PROTOCOL_V2]
+GIT_PROTOCOL_PATTERN = re.compile(r'^[-\w.=:]{1,256}$')     # colon separated 'key=value' parameters.
+
 
 def is_valid_git_service(service):
     """
@@ -9,3 +18,28 @@ def is_valid_git_service(service):
     """
 
     return service in GIT_SERVICES
+
+
+def parse_git_protocol(value):
+    """
+        Returns the given 'Git-Protocol' header value if it's a safe one to be passed to git
+            as 'GIT_PROTOCOL' environment variable, else None.
+
+        e.g.
+            'version=2'
+    """
+
+    if value is None or GIT_PROTOCOL_PATTERN.match(value) is None:
+        return None
+    return value
+
+
+def get_git_protocol_version(protocol):
+    """
+        Returns wire protocol version requested by the given protocol parameters,
+            which is the highest supported one among requested versions.
+    """
+
+    versions = [int(item[len('version='):]) for item in (protocol or '').split(':')
+                    if item.startswith('version=') and item[len('version='):].isdigit()]
+    return max([version for version in versions if version in GIT_PROTOCOL_VERSIONS] + [GIT_PROTOCOL_V0])
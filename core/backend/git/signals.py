@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after a 'git-receive-pack' request is served and git has updated repository.
+#   'repo' argument is the git.repo.Repo object which is pushed to.
+post_receive = Signal(providing_args=['repo'])
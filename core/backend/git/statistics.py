@@ -1,26 +1,15 @@
+import os
 import json
-from dateutil import parser
-from datetime import datetime
+import tempfile
+from array import array
+from urllib.parse import quote
+from datetime import date, datetime, timedelta
 
-from utils.date import get_year, get_month, get_weeknumber, get_weekday
+GIT_STATISTICS_FOLDER = 'djacket'   # folder inside repository for keeping statistics indexes.
+GIT_STATISTICS_INDEX_VERSION = 2     # indexes of other versions are rebuilt.
 
-
-def extract_month(utc_timestamp):
-    """
-        Extracts month from utc timestamp string.
-    """
-
-    datetime = parser.parse(utc_timestamp)
-    return '{0}-{1}'.format(datetime.year, datetime.month)
-
-
-def extract_day(utc_timestamp):
-    """
-        Extracts day from utc timestamp string.
-    """
-
-    datetime = parser.parse(utc_timestamp)
-    return '{0}-{1}-{2}'.format(datetime.year, datetime.month, datetime.day)
+SECONDS_PER_DAY = 24 * 60 * 60
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
 
 class DataPresentation:
@@ -50,6 +39,146 @@ class DataPresentation:
             return data
 
 
+class DateHistogram:
+    """
+        Buckets days since epoch (e.g. of committer dates, as kept by GitCommitsIndex) into daily,
+            ISO weekly or monthly histograms in a single pass. Days and their counts are kept as
+            flat integer arrays, so bucketing never parses a date string and each distinct day
+            is converted to a calendar date only once.
+        Buckets are keyed by their first day (the day itself, monday of ISO week or first day of month).
+    """
+
+    DAILY_BUCKETS = 'daily'
+    WEEKLY_BUCKETS = 'weekly'
+    MONTHLY_BUCKETS = 'monthly'
+    VALID_BUCKETS = [DAILY_BUCKETS, WEEKLY_BUCKETS, MONTHLY_BUCKETS]
+
+
+    def __init__(self, days, counts):
+        self.days = array('q', days)
+        self.counts = array('q', counts)
+        if len(self.days) != len(self.counts): raise ValueError('Days and counts should have the same length.')
+
+
+    @staticmethod
+    def to_day(day):
+        """
+            Returns number of days since epoch for the given date.
+        """
+
+        return day.toordinal() - EPOCH_ORDINAL
+
+
+    @staticmethod
+    def get_bucket(day, by):
+        """
+            Returns first day of the bucket which the given day (since epoch) falls in.
+        """
+
+        bucket = date.fromordinal(day + EPOCH_ORDINAL)
+        if by == DateHistogram.WEEKLY_BUCKETS:
+            return bucket - timedelta(days=bucket.weekday())
+        elif by == DateHistogram.MONTHLY_BUCKETS:
+            return bucket.replace(day=1)
+        return bucket
+
+
+    def histogram(self, by, since=None, until=None, fill=False):
+        """
+            Returns a dict of bucket's first day to number of entries inside it for entries
+                between 'since' and 'until' dates (both inclusive, unbounded if missing).
+                If 'fill' is true and range is bounded, empty buckets inside range are included too.
+        """
+
+        if not by in self.VALID_BUCKETS: raise ValueError('Input bucket interval is not a valid one.')
+
+        low = self.to_day(since) if since is not None else None
+        high = self.to_day(until) if until is not None else None
+
+        buckets, day_buckets = {}, {}
+        if fill and low is not None and high is not None:
+            for day in range(low, high + 1):
+                buckets[day_buckets.setdefault(day, self.get_bucket(day, by))] = 0
+
+        for day, count in zip(self.days, self.counts):
+            if (low is None or day >= low) and (high is None or day <= high):
+                bucket = day_buckets.get(day)
+                if bucket is None:
+                    bucket = day_buckets[day] = self.get_bucket(day, by)
+                buckets[bucket] = buckets.get(bucket, 0) + count
+        return buckets
+
+
+class GitCommitsIndex:
+    """
+        Persisted index of number of commits per day (days since epoch, in UTC) for a reference of a
+            repository. Index is kept as a json file inside repository and it's updated incrementally,
+            from the latest indexed commit up to the new tip of reference. If reference is
+            rewritten (e.g. by a force push) index is rebuilt from scratch.
+    """
+
+    def __init__(self, repo, ref):
+        self.repo = repo
+        self.ref = ref
+        self.path = os.path.join(repo.location, GIT_STATISTICS_FOLDER, 'commits-{0}.json'.format(quote(ref, safe='')))
+
+
+    def load(self):
+        """
+            Returns stored index with it's latest indexed commit ('tip') and commits per day ('days').
+        """
+
+        try:
+            with open(self.path) as index_file:
+                stored = json.load(index_file)
+            if stored.get('version') == GIT_STATISTICS_INDEX_VERSION:  # older indexes are rebuilt.
+                return {'tip': stored['tip'], 'days': {day: count for day, count in stored['days']}}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return {'tip': None, 'days': {}}
+
+
+    def save(self, index):
+        """
+            Stores the given index. Index is written to a temporary file first and then moved
+                in place, so readers never see a partially written index.
+        """
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        with os.fdopen(descriptor, 'w') as index_file:
+            json.dump({'version': GIT_STATISTICS_INDEX_VERSION, 'tip': index['tip'],
+                        'days': sorted(index['days'].items())}, index_file)
+        os.replace(temporary_path, self.path)
+
+
+    def update(self):
+        """
+            Brings index up to date with current tip of reference and returns it.
+        """
+
+        index = self.load()
+        tip = self.repo.get_object_info('{0}^{{commit}}'.format(self.ref))
+        tip = None if tip is None else tip[0]
+        if tip == index['tip']:
+            return index
+
+        if tip is None:
+            index = {'tip': None, 'days': {}}
+        else:
+            if index['tip'] is not None and self.repo.is_ancestor(index['tip'], tip):
+                revisions = '{0}..{1}'.format(index['tip'], tip)  # only commits added since latest update.
+            else:
+                index, revisions = {'tip': None, 'days': {}}, tip
+            for timestamp in self.repo.iter_commit_timestamps(revisions):
+                day = timestamp // SECONDS_PER_DAY
+                index['days'][day] = index['days'].get(day, 0) + 1
+            index['tip'] = tip
+
+        self.save(index)
+        return index
+
+
 class GitStatistics:
     """
         Generates data analysis for a git repository. This data will be available
@@ -67,43 +196,51 @@ class GitStatistics:
     def __init__(self, repo, rev):
         self.repo = repo
         self.rev = rev
+        self.histogram = None
 
-        self.current_year = datetime.utcnow().isocalendar()[0]
-        self.current_week = datetime.utcnow().isocalendar()[1]
+        self.today = datetime.utcnow().date()
 
 
-    def _for_commits_daily(self, commits):
+    def get_histogram(self):
         """
-            Returns number of commits per day for the given commits.
+            Returns a DateHistogram of revision's commits, read from it's commits index.
+                Index is brought up to date once per object.
         """
 
-        # get dates only in the current year.
-        dates = [extract_day(commit.get_committer_date()) for commit in commits   \
-                        if get_year(commit.get_committer_date()) == self.current_year]
-        return {date: dates.count(date) for date in dates}
+        if self.histogram is None:
+            days = GitCommitsIndex(self.repo, self.rev).update()['days']
+            self.histogram = DateHistogram(days.keys(), days.values())
+        return self.histogram
 
 
-    def _for_commits_weekly(self, commits):
+    def _for_commits_daily(self):
         """
-            Returns number of commits per day for the given commits.
+            Returns number of commits per day in the current year.
         """
 
-        # get dates only in the current year and current week.
-        dates = [get_weekday(extract_day(commit.get_committer_date())) for commit in commits  \
-                        if get_year(commit.get_committer_date()) == self.current_year and \
-                           get_weeknumber(commit.get_committer_date()) == self.current_week]
+        days = self.get_histogram().histogram(DateHistogram.DAILY_BUCKETS, since=date(self.today.year, 1, 1),
+                                                until=date(self.today.year, 12, 31))
+        return {'{0}-{1}-{2}'.format(day.year, day.month, day.day): count for day, count in days.items()}
 
-        return {wd: dates.count(wd) if wd in dates else 0 for wd in range(1, 8)}
 
+    def _for_commits_weekly(self):
+        """
+            Returns number of commits per week day (1 for monday to 7 for sunday) in the current week.
+        """
+
+        monday = self.today - timedelta(days=self.today.weekday())
+        days = self.get_histogram().histogram(DateHistogram.DAILY_BUCKETS, since=monday, until=monday + timedelta(days=6), fill=True)
+        return {day.isoweekday(): count for day, count in days.items()}
 
-    def _for_commits_monthly(self, commits):
+
+    def _for_commits_monthly(self):
         """
-            Returns number of commits per month for the given commits.
+            Returns number of commits per month (1 to 12) in the current year.
         """
 
-        dates = [get_month(extract_month(commit.get_committer_date())) for commit in commits
-                        if get_year(commit.get_committer_date()) == self.current_year]
-        return {mn: dates.count(mn) if mn in dates else 0 for mn in range(1, 13)}
+        months = self.get_histogram().histogram(DateHistogram.MONTHLY_BUCKETS, since=date(self.today.year, 1, 1),
+                                                    until=date(self.today.year, 12, 31), fill=True)
+        return {month.month: count for month, count in months.items()}
 
 
     def for_commits(self, by, data_format):
@@ -113,11 +250,28 @@ class GitStatistics:
 
         if not by in self.VALID_DATA_GENERATION_INTERVALS: raise ValueError('Input interval is not a valid one.')
 
-        commits = self.repo.get_commits(self.rev)
+        if by == self.DAILY_INTERVALS:
+            return DataPresentation(data_format).present(self._for_commits_daily())
+        elif by == self.WEEKLY_INTERVALS:
+            return DataPresentation(data_format).present(self._for_commits_weekly())
+        elif by == self.MONTHLY_INTERVALS:
+            return DataPresentation(data_format).present(self._for_commits_monthly())
+
+
+    def for_commits_between(self, by, since, until, data_format):
+        """
+            Returns dataset for number of commits per given time interval between 'since' and
+                'until' dates (both inclusive). Empty intervals are included and intervals are
+                labeled as '2017-10-18' (daily), '2017-W42' (weekly) or '2017-10' (monthly).
+        """
+
+        if not by in self.VALID_DATA_GENERATION_INTERVALS: raise ValueError('Input interval is not a valid one.')
 
+        buckets = self.get_histogram().histogram(by, since=since, until=until, fill=True)
         if by == self.DAILY_INTERVALS:
-            return DataPresentation(data_format).present(self._for_commits_daily(commits))
+            labels = {bucket: bucket.strftime('%Y-%m-%d') for bucket in buckets}
         elif by == self.WEEKLY_INTERVALS:
-            return DataPresentation(data_format).present(self._for_commits_weekly(commits))
+            labels = {bucket: '{0}-W{1:02d}'.format(*bucket.isocalendar()[:2]) for bucket in buckets}
         elif by == self.MONTHLY_INTERVALS:
-            return DataPresentation(data_format).present(self._for_commits_monthly(commits))
+            labels = {bucket: bucket.strftime('%Y-%m') for bucket in buckets}
+        return DataPresentation(data_format).present({labels[bucket]: count for bucket, count in sorted(buckets.items())})
@@ -5,5 +5,5 @@ from repository.api.views import commits_stats, readme
 
 urlpatterns = [
     url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/commits_stats$', commits_stats, name='commits_stats'),
-    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/readme/(?P<rev>[-\w]+)/*', readme, name='readme'),
+    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/readme/(?P<rev>[-\w.]+)/*', readme, name='readme'),
 ]
@@ -1,19 +1,25 @@
 import json
+from datetime import datetime, timedelta
 
 from django.http import Http404, HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_http_methods, etag
 
 from repository.decorators import require_existing_repo, require_existing_rev, require_access, require_valid_readme
 from git.statistics import DataPresentation
 from utils.urlparser import partition_url
 from utils.decorators import require_ajax
 from git.statistics import GitStatistics
+from git.readme import render_readme
 from git.object import GitBlob
 from git.repo import Repo
 
-weekly, monthly = GitStatistics.WEEKLY_INTERVALS, GitStatistics.MONTHLY_INTERVALS
+daily, weekly, monthly = GitStatistics.DAILY_INTERVALS, GitStatistics.WEEKLY_INTERVALS, GitStatistics.MONTHLY_INTERVALS
 py, js = DataPresentation.PY_FORMAT, DataPresentation.JS_FORMAT
 
+STATS_DEFAULT_RANGE = timedelta(days=365)   # range of statistics when only one of 'since'/'until' is given.
+STATS_MAX_RANGE = timedelta(days=10 * 366)  # longest range of statistics that can be requested.
+
 
 @require_http_methods(['GET'])
 @require_access
@@ -21,28 +27,65 @@ py, js = DataPresentation.PY_FORMAT, DataPresentation.JS_FORMAT
 @require_ajax
 def commits_stats(request, username, repository):
     """
-        Returns number of commits for the given repository.
+        Returns number of commits for the given repository. By default commits of the current week and year
+            are returned. Statistics of any other range can be requested by 'since' and 'until' dates in
+            query string (e.g. '?since=2016-01-01&until=2016-12-31').
     """
 
     repo = Repo(Repo.get_repository_location(username, repository))
     stats = GitStatistics(repo, repo.get_head())
 
-    return HttpResponse(json.dumps({'weekly': stats.for_commits(weekly, js), 'monthly': stats.for_commits(monthly, js)}))
+    since, until = _parse_date(request.GET.get('since')), _parse_date(request.GET.get('until'))
+    if since is None and until is None:
+        return HttpResponse(json.dumps({'weekly': stats.for_commits(weekly, js), 'monthly': stats.for_commits(monthly, js)}))
+
+    try:
+        until = until or min(since + STATS_DEFAULT_RANGE, datetime.utcnow().date())
+        since = max(since or until - STATS_DEFAULT_RANGE, until - STATS_MAX_RANGE)
+    except OverflowError:   # range is out of supported dates.
+        raise Http404
+    return HttpResponse(json.dumps({interval: stats.for_commits_between(interval, since, until, js)
+                                        for interval in [daily, weekly, monthly]}))
+
+
+def _get_readme_etag(request, username, repository, rev):
+    """
+        Returns ETag of a README, which is it's blob's SHA-1 hash since it identifies it's content.
+    """
+
+    info = GitBlob(repo=Repo(Repo.get_repository_location(username, repository)),
+                    path='/'.join(partition_url(request.path_info)[5:]), rev=rev).get_info()
+    return None if info is None else info[0]
 
 
 @require_http_methods(['GET'])
+@cache_control(private=True, no_cache=True)
 @require_access
 @require_existing_repo
+@etag(_get_readme_etag)
 @require_existing_rev
 @require_valid_readme
 @require_ajax
 def readme(request, username, repository, rev):
     """
-        Returns README content of a folder inside the given repository.
+        Returns rendered html of a README inside the given repository.
     """
 
     repo = Repo(Repo.get_repository_location(username, repository))
     request_sections = partition_url(request.path_info)
-    rdm = GitBlob(repo=repo, path='/'.join(request_sections[5:]), rev=rev).show()
+    rdm = render_readme(GitBlob(repo=repo, path='/'.join(request_sections[5:]), rev=rev))
+    if rdm is None:
+        raise Http404()
+
+    return HttpResponse(rdm['html'])
+
+
+def _parse_date(value):
+    """
+        Returns date of the given 'YYYY-MM-DD' query string value or None if it's missing or invalid.
+    """
 
-    return HttpResponse(rdm)
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
@@ -1,12 +1,27 @@
 from functools import wraps
 
 from django.http import Http404
-from django.contrib.auth.models import User
 
 from repository.models import Repository
+from git.readme import GIT_README_NAMES
 from git.repo import Repo
 
 
+def get_requested_repo(request, username, repository):
+    """
+        Returns requested repository (with it's owner) of the given request. Repository is resolved
+            with a single query once per request and kept on request object, so all decorators
+            and views of the request reuse it.
+        Raises Repository.DoesNotExist if there's no such repository.
+    """
+
+    requested = getattr(request, 'requested_repo', None)
+    if requested is None or requested.owner.username != username or requested.name != repository:
+        requested = Repository.objects.get_by_owner(username, repository)
+        request.requested_repo = requested
+    return requested
+
+
 def require_existing_repo(func):
     """
         Checks to see if requested repository is available on user's deposit.
@@ -16,8 +31,7 @@ def require_existing_repo(func):
     @wraps(func)
     def _decorator(request, *args, **kwargs):
         try:
-            user = User.objects.get(username=kwargs['username'])
-            repo = Repository.objects.get(owner=user, name=kwargs['repository'])
+            get_requested_repo(request, kwargs['username'], kwargs['repository'])
             return func(request, *args, **kwargs)
         except:
             raise Http404()
@@ -26,7 +40,7 @@ def require_existing_repo(func):
 
 def require_existing_rev(func):
     """
-        Checks to see if requested revision exists in repository.
+        Checks to see if requested revision (a branch, a tag or a full SHA-1 hash) exists in repository.
             Raises 404 if not.
     """
 
@@ -34,8 +48,7 @@ def require_existing_rev(func):
     def _decorator(request, *args, **kwargs):
         try:
             repo = Repo(Repo.get_repository_location(kwargs['username'], kwargs['repository']))
-            branches = repo.get_branches()
-            if 'rev' not in kwargs or kwargs['rev'] in branches + ['HEAD']:
+            if 'rev' not in kwargs or kwargs['rev'] == 'HEAD' or repo.resolve_rev(kwargs['rev']) is not None:
                 return func(request, *args, **kwargs)
             else:
                 raise Http404()
@@ -55,9 +68,8 @@ def require_access(func):
     @wraps(func)
     def _decorator(request, *args, **kwargs):
         try:
-            user = User.objects.get(username=kwargs['username'])
-            repo = Repository.objects.get(owner=user, name=kwargs['repository'])
-            if repo.private and request.user.id != user.id:
+            repo = get_requested_repo(request, kwargs['username'], kwargs['repository'])
+            if repo.private and request.user.id != repo.owner_id:
                 raise Http404()
             else:
                 return func(request, *args, **kwargs)
@@ -90,7 +102,7 @@ def require_valid_readme(func):
 
     @wraps(func)
     def _decorator(request, *args, **kwargs):
-        if request.path_info.endswith('README.md') or request.path_info.endswith('README.rst'):
+        if request.path_info.rpartition('/')[2] in [name for name, readme_format in GIT_README_NAMES]:
             return func(request, *args, **kwargs)
         else:
             raise Http404()
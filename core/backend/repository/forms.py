@@ -1,6 +1,7 @@
 from django import forms
 
 from repository.models import Repository, REPOSITORY_NAME_MAX_LENGTH, REPOSITORY_NAME_MIN_LENGTH, REPOSITORY_DESCRIPTION_MAX_LENGTH
+from git.catfile import catfile_pool
 from utils.system import rename_tree
 from git.repo import Repo
 
@@ -124,8 +125,9 @@ class RepositoryCreationForm(forms.Form):
         if self.edit:
             self._update_instance(data)
             if self.instance.name != self.repo_entering_name:   # rename repository folder if it's name has changed.
-                rename_tree(Repo.get_repository_location(
-                                self.instance.owner.username, self.repo_entering_name), '{0}.git'.format(self.instance.name))
+                repository_location = Repo.get_repository_location(self.instance.owner.username, self.repo_entering_name)
+                catfile_pool.discard(repository_location)
+                rename_tree(repository_location, '{0}.git'.format(self.instance.name))
         elif not self.edit:
             repository = Repository.objects.create(name=data['name'],
                             description=data['description'], owner=self.user, private=data['private'])
@@ -0,0 +1,69 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.core.management.base import BaseCommand
+
+from repository.models import Repository
+
+logger = logging.getLogger('django')
+
+
+class Command(BaseCommand):
+    """
+        Maintenance worker of repositories. Repositories due for maintenance (see settings) are
+            repacked and their commit-graph written, in at most GIT_MAINTENANCE_MAX_JOBS concurrent
+            jobs. Runs every GIT_MAINTENANCE_INTERVAL seconds unless '--once' is given.
+    """
+
+    help = 'Repacks repositories and writes their commit-graph in background.'
+
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single maintenance pass and exit.')
+        parser.add_argument('--all', action='store_true', help='Maintain all repositories, not only the due ones.')
+        parser.add_argument('--full', action='store_true', help='Fully repack repositories with a bitmap index.')
+        parser.add_argument('--jobs', type=int, default=settings.GIT_MAINTENANCE_MAX_JOBS,
+                                help='Maximum number of concurrent maintenance jobs.')
+
+
+    def handle(self, *args, **options):
+        while True:
+            repositories = Repository.objects.select_related('owner').all() if options['all'] \
+                                else Repository.objects.due_for_maintenance()
+            self.run_pass(list(repositories), max(options['jobs'], 1), True if options['full'] else None)
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(settings.GIT_MAINTENANCE_INTERVAL)
+
+
+    def run_pass(self, repositories, jobs, full):
+        """
+            Maintains the given repositories in a pool of 'jobs' threads.
+        """
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for repository, result in zip(repositories, executor.map(lambda r: self.maintain(r, full), repositories)):
+                if result is None:
+                    self.stdout.write('{0} is skipped, it\'s being maintained already.'.format(repository))
+                elif result:
+                    self.stdout.write('{0} is maintained.'.format(repository))
+                else:
+                    self.stderr.write('{0} maintenance failed.'.format(repository))
+
+
+    def maintain(self, repository, full):
+        """
+            Runs maintenance of a single repository, in a thread of pool.
+        """
+
+        try:
+            return repository.maintain(full)
+        except Exception as e:
+            logger.error('MAINTAIN_REPOSITORIES -> ERR ({0}: {1})'.format(repository, e))
+            return False
+        finally:
+            close_old_connections()
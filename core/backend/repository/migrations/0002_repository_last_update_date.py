@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 16:21
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='last_update_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
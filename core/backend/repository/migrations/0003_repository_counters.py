@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 16:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    """
+        Fills stars and forks counters of existing repositories from their star and fork records.
+    """
+
+    Repository = apps.get_model('repository', 'Repository')
+    repositories = Repository.objects.annotate(stars_total=Count('repositorystar', distinct=True),
+                                                forks_total=Count('repositoryfork', distinct=True))
+    for repository in repositories.filter(stars_total__gt=0) | repositories.filter(forks_total__gt=0):
+        Repository.objects.filter(pk=repository.pk).update(stars_count=repository.stars_total,
+                                                            forks_count=repository.forks_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0002_repository_last_update_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='forks_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='repository',
+            name='stars_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
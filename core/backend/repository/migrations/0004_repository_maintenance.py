@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 16:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0003_repository_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='maintenance_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='repository',
+            name='pushes_since_maintenance',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
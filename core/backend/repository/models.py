@@ -1,8 +1,11 @@
-from django.db import models
-from django.db.models import Q
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q, F, Count
 from django.contrib.auth.models import User
 
-from utils.date import time_to_utc
+from utils.date import datetime_to_utc
 from git.repo import Repo
 
 REPOSITORY_NAME_MAX_LENGTH = 64
@@ -40,6 +43,38 @@ class RepositoryManager(models.Manager):
         return super(RepositoryManager, self).get_queryset().filter(Q(owner_id=user.id) & Q(private=False))
 
 
+    def with_counts(self):
+        """
+            Returns repositories annotated with their number of stars and forks ('stars_total' and
+                'forks_total') counted from star and fork records in a single query.
+        """
+
+        return super(RepositoryManager, self).get_queryset().annotate(
+                    stars_total=Count('repositorystar', distinct=True), forks_total=Count('repositoryfork', distinct=True))
+
+
+    def get_by_owner(self, username, name):
+        """
+            Returns a repository by it's owner's username and it's name along with it's owner in a single query.
+        """
+
+        return super(RepositoryManager, self).get_queryset().select_related('owner').get(owner__username=username, name=name)
+
+
+    def due_for_maintenance(self):
+        """
+            Returns repositories which are due for maintenance, i.e. pushed to GIT_MAINTENANCE_PUSHES times
+                or pushed to and not maintained in the last GIT_MAINTENANCE_MAX_AGE seconds.
+                Most pushed repositories come first.
+        """
+
+        expired = datetime.now(timezone.utc) - timedelta(seconds=settings.GIT_MAINTENANCE_MAX_AGE)
+        return super(RepositoryManager, self).get_queryset().select_related('owner').filter(
+                    Q(pushes_since_maintenance__gte=settings.GIT_MAINTENANCE_PUSHES) |
+                    Q(pushes_since_maintenance__gt=0) & (Q(maintenance_date__isnull=True) | Q(maintenance_date__lt=expired))
+                ).order_by('-pushes_since_maintenance')
+
+
 class Repository(models.Model):
     """
         A one-to-many model for keeping users repositries and it's data.
@@ -50,6 +85,11 @@ class Repository(models.Model):
     creation_date = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(User)
     private = models.BooleanField(default=False)
+    last_update_date = models.DateTimeField(null=True, blank=True)
+    stars_count = models.PositiveIntegerField(default=0)
+    forks_count = models.PositiveIntegerField(default=0)
+    pushes_since_maintenance = models.PositiveIntegerField(default=0)
+    maintenance_date = models.DateTimeField(null=True, blank=True)
 
     objects = RepositoryManager()
 
@@ -64,7 +104,7 @@ class Repository(models.Model):
             Propery for how many stars this repository has.
         """
 
-        return RepositoryStar.objects.filter(repository_id=self.id).count()
+        return self.stars_count
 
 
     @property
@@ -73,7 +113,7 @@ class Repository(models.Model):
             Property for how many times this repository has been forked.
         """
 
-        return RepositoryFork.objects.filter(repository_id=self.id).count()
+        return self.forks_count
 
 
     @property
@@ -85,17 +125,69 @@ class Repository(models.Model):
         return RepositoryAccess.objects.filter(repository_id=self.id)
 
 
+    def has_access(self, user):
+        """
+            Returns true if the given user has access to this repository.
+                Result is memoized per user on the repository object.
+        """
+
+        if not hasattr(self, '_access_cache'):
+            self._access_cache = {}
+        if not user.id in self._access_cache:
+            self._access_cache[user.id] = RepositoryAccess.objects.filter(repository_id=self.id, user_id=user.id).exists()
+        return self._access_cache[user.id]
+
+
+    @staticmethod
+    def update_counter(repository_id, counter, delta):
+        """
+            Atomically adds 'delta' to the given counter column (e.g. 'stars_count' or 'forks_count') of a repository.
+        """
+
+        Repository.objects.filter(pk=repository_id).update(**{counter: F(counter) + delta})
+
+
+    def update_last_update_date(self):
+        """
+            Reads latest activity date of repository from git and stores it. Repositories
+                without any commits are considered as updated on their creation.
+        """
+
+        timestamp = Repo(Repo.get_repository_location(self.owner.username, self.name)).get_last_update_timestamp()
+        if timestamp is None:
+            self.last_update_date = self.creation_date
+        else:
+            self.last_update_date = datetime.fromtimestamp(timestamp, timezone.utc)
+        Repository.objects.filter(pk=self.pk).update(last_update_date=self.last_update_date)
+
+
     @property
     def last_update(self):
         """
             Property for viewing latest activty date on repository in "ISO 8601-like" format and 'UTC' timezone.
+                Date is stored on repository after each push, so no git command is needed for it.
+                Repositories which don't have it stored yet are filled in on first access.
         """
 
-        last_update = Repo(Repo.get_repository_location(self.owner.username, self.name)).get_last_update()
-        if last_update is None:
-            return time_to_utc(str(self.creation_date))
-        else:
-            return last_update
+        if self.last_update_date is None:
+            self.update_last_update_date()
+        return datetime_to_utc(self.last_update_date)
+
+
+    def maintain(self, full=None):
+        """
+            Runs maintenance of repository's git storage (see 'Repo.maintain') and on success stores it's
+                date and takes pushes it covered off the counter. Pushes arriving meanwhile are kept.
+                Returns result of maintenance.
+        """
+
+        pushes = self.pushes_since_maintenance
+        result = Repo(Repo.get_repository_location(self.owner.username, self.name)).maintain(full)
+        if result:
+            self.maintenance_date = datetime.now(timezone.utc)
+            Repository.objects.filter(pk=self.pk).update(maintenance_date=self.maintenance_date,
+                                        pushes_since_maintenance=F('pushes_since_maintenance') - pushes)
+        return result
 
 
     @property
@@ -130,6 +222,15 @@ class RepositoryStar(models.Model):
     repository = models.ForeignKey(Repository)
 
 
+    def save(self, *args, **kwargs):
+        """
+            Saves record in a transaction, so repository's counter (updated by signals) changes along with it.
+        """
+
+        with transaction.atomic():
+            super(RepositoryStar, self).save(*args, **kwargs)
+
+
     def __str__(self):
         return '{0}\'s star for {1}'.format(self.user.username, self.repository.name)
 
@@ -143,6 +244,15 @@ class RepositoryFork(models.Model):
     repository = models.ForeignKey(Repository)
 
 
+    def save(self, *args, **kwargs):
+        """
+            Saves record in a transaction, so repository's counter (updated by signals) changes along with it.
+        """
+
+        with transaction.atomic():
+            super(RepositoryFork, self).save(*args, **kwargs)
+
+
     def __str__(self):
         return '{0} forked {1}'.format(self.user.username, self.repository.name)
 
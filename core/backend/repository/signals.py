@@ -1,7 +1,12 @@
 from django.conf import settings
 from django.db.models import signals
 
-from repository.models import Repository, RepositoryAccess
+from repository.models import Repository, RepositoryAccess, RepositoryStar, RepositoryFork
+from git.statistics import GitCommitsIndex
+from git.signals import post_receive
+from git.catfile import catfile_pool
+from git.refs import refs_cache
+from git.odb import object_stores
 from utils.system import remove_tree
 from git.repo import Repo
 
@@ -34,9 +39,92 @@ def remove_repo_signal(sender, instance, using, **kwargs):
     """
 
     # Remove repository folder under GIT_DEPOSIT_ROOT/username/repository.git
-    remove_tree(Repo.get_repository_location(instance.owner.username, instance.name))
+    repository_location = Repo.get_repository_location(instance.owner.username, instance.name)
+    catfile_pool.discard(repository_location)
+    refs_cache.discard(repository_location)
+    object_stores.discard(repository_location)
+    remove_tree(repository_location)
+
+
+def count_star_signal(sender, instance, created, **kwargs):
+    """
+        Increase stars counter of repository after it's starred.
+    """
+
+    if created:
+        Repository.update_counter(instance.repository_id, 'stars_count', 1)
+
+
+def uncount_star_signal(sender, instance, using, **kwargs):
+    """
+        Decrease stars counter of repository after a star is removed.
+    """
+
+    Repository.update_counter(instance.repository_id, 'stars_count', -1)
+
+
+def count_fork_signal(sender, instance, created, **kwargs):
+    """
+        Increase forks counter of repository after it's forked.
+    """
+
+    if created:
+        Repository.update_counter(instance.repository_id, 'forks_count', 1)
+
+
+def uncount_fork_signal(sender, instance, using, **kwargs):
+    """
+        Decrease forks counter of repository after a fork is removed.
+    """
+
+    Repository.update_counter(instance.repository_id, 'forks_count', -1)
+
+
+def clear_info_refs_signal(sender, repo, **kwargs):
+    """
+        Clear cached refs advertisements of repository after a push.
+    """
+
+    repo.clear_info_refs()
+
+
+def update_last_update_signal(sender, repo, **kwargs):
+    """
+        Store latest activity date of repository after a push.
+    """
+
+    username, name = Repo.parse_repository_location(repo.location)
+    for repository in Repository.objects.filter(owner__username=username, name=name).select_related('owner'):
+        repository.update_last_update_date()
+
+
+def count_push_signal(sender, repo, **kwargs):
+    """
+        Increase pushes counter of repository after a push, which schedules it's maintenance.
+    """
+
+    username, name = Repo.parse_repository_location(repo.location)
+    for repository_id in Repository.objects.filter(owner__username=username, name=name).values_list('id', flat=True):
+        Repository.update_counter(repository_id, 'pushes_since_maintenance', 1)
+
+
+def update_commits_index_signal(sender, repo, **kwargs):
+    """
+        Update commits statistics index of repository branches after a push.
+    """
+
+    for branch in repo.get_branches():
+        GitCommitsIndex(repo, branch).update()
 
 
 signals.post_save.connect(init_bare_repo_signal, sender=Repository, weak=False)
 signals.post_save.connect(add_repo_access_signal, sender=Repository, weak=False)
 signals.post_delete.connect(remove_repo_signal, sender=Repository, weak=False)
+signals.post_save.connect(count_star_signal, sender=RepositoryStar, weak=False)
+signals.post_delete.connect(uncount_star_signal, sender=RepositoryStar, weak=False)
+signals.post_save.connect(count_fork_signal, sender=RepositoryFork, weak=False)
+signals.post_delete.connect(uncount_fork_signal, sender=RepositoryFork, weak=False)
+post_receive.connect(clear_info_refs_signal, weak=False)
+post_receive.connect(update_last_update_signal, weak=False)
+post_receive.connect(update_commits_index_signal, weak=False)
+post_receive.connect(count_push_signal, weak=False)
@@ -1 +1,151 @@
+import os
+import shutil
+import tempfile
+from subprocess import run, PIPE
+
 from django.test import TestCase
+
+from git.readme import GIT_README_MARKDOWN, GIT_README_RESTRUCTUREDTEXT, render
+from git.repo import Repo
+from git.http import GitStreamingResponse
+from git.action import GIT_ACTION_RESULT
+from git.service import GIT_SERVICE_RECEIVE_PACK
+from git.signals import post_receive
+from git.pktline import FLUSH_PKT, encode_packet
+
+
+class ReadmeRenderTestCase(TestCase):
+    """
+        Rendered READMEs are shown as is in pages, so they must never carry scripts.
+    """
+
+    def test_restructuredtext_links(self):
+        html = render('`x <javascript:alert(1)>`_ `y`_ `ok <https://example.com>`_ `rel <docs/a.rst>`_\n\n'
+                        '.. _y: JaVa\tScript:alert(2)\n', GIT_README_RESTRUCTUREDTEXT)
+        self.assertNotIn('javascript', html.lower())
+        self.assertIn('href="https://example.com"', html)
+        self.assertIn('href="docs/a.rst"', html)
+
+
+    def test_restructuredtext_images(self):
+        html = render('.. image:: javascript:alert(1)\n\n.. image:: pic.png\n   :target: javascript:alert(2)\n\n'
+                        '.. figure:: data:text/html,x\n', GIT_README_RESTRUCTUREDTEXT)
+        self.assertNotIn('src="javascript:', html)
+        self.assertNotIn('href="javascript:', html)
+        self.assertNotIn('src="data:', html)
+        self.assertIn('src="pic.png"', html)
+
+
+    def test_markdown(self):
+        html = render('[a](javascript:alert(1)) ![i](javascript:alert(2)) [r][x] [m](mailto:a@b.c) [f](#top)\n\n'
+                        '[x]: javascript:alert(3)\n\n<script>alert(4)</script>\n', GIT_README_MARKDOWN)
+        self.assertNotIn('javascript:', html)
+        self.assertNotIn('<script>', html)
+        self.assertIn('href="mailto:a@b.c"', html)
+        self.assertIn('href="#top"', html)
+
+
+class GitTestCase(TestCase):
+    """
+        Base of tests which need a bare repository and a work tree to make it's commits in.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.git('init', '--bare', '-q', 'repo.git')
+        self.git('init', '-q', 'work')
+        self.repo = Repo('{0}/repo.git'.format(self.root))
+
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+    def git(self, *args, data=None):
+        return run(('git',) + args, input=data, stdout=PIPE, stderr=PIPE, cwd=self.root, check=True).stdout
+
+
+    def commit(self, files, message):
+        """
+            Writes the given files (a dict of their paths and contents) in work tree, commits them
+                and returns SHA-1 hash of the commit.
+        """
+
+        for path, content in files.items():
+            os.makedirs(os.path.dirname('{0}/work/{1}'.format(self.root, path)), exist_ok=True)
+            with open('{0}/work/{1}'.format(self.root, path), 'w') as work_file:
+                work_file.write(content)
+        self.git('-C', 'work', 'add', '--all')
+        self.git('-C', 'work', '-c', 'user.name=a', '-c', 'user.email=a@b.c', 'commit', '-q', '-m', message)
+        return self.git('-C', 'work', 'rev-parse', 'HEAD').decode('ascii').strip()
+
+
+class PostReceiveTestCase(GitTestCase):
+    """
+        'post_receive' schedules maintenance and indexing of repository, so it's only sent for pushes
+            which actually update it.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.commit_hash = self.commit({'file.txt': 'content\n'}, 'first')
+        self.received = []
+        post_receive.connect(self.receive)
+
+
+    def tearDown(self):
+        post_receive.disconnect(self.receive)
+        super().tearDown()
+
+
+    def receive(self, sender, repo, **kwargs):
+        self.received.append(repo)
+
+
+    def push(self, payload):
+        response = GitStreamingResponse(service=GIT_SERVICE_RECEIVE_PACK, action=GIT_ACTION_RESULT,
+                        repository=self.repo, data=payload).get_http_service_rpc()
+        output = b''.join(response.streaming_content)
+        response.close()
+        return output
+
+
+    def get_commands(self, new):
+        return encode_packet('{0} {1} refs/heads/master\0report-status\n'.format('0' * 40, new)) + FLUSH_PKT
+
+
+    def test_push(self):
+        pack = self.git('-C', 'work', 'pack-objects', '--stdout', '--revs', data=b'HEAD\n')
+        self.assertIn(b'ok refs/heads/master', self.push(self.get_commands(self.commit_hash) + pack))
+        self.assertEqual(self.received, [self.repo])
+
+
+    def test_probe(self):
+        self.push(FLUSH_PKT)
+        self.assertEqual(self.received, [])
+
+
+    def test_failed_push(self):
+        pack = self.git('-C', 'repo.git', 'pack-objects', '--stdout', data=b'')    # an empty pack.
+        self.assertIn(b'ng refs/heads/master', self.push(self.get_commands(self.commit_hash) + pack))
+        self.push(b'garbage')
+        self.assertEqual(self.received, [])
+
+
+class LastCommitsTestCase(GitTestCase):
+    """
+        Latest commits of a folder's entries are resolved in a single walk of it's history.
+    """
+
+    def test_quoted_names(self):
+        first = self.commit({'sp dir/t\tab.txt': 'a', 'sp dir/q"uote\\.txt': 'b', 'plain.txt': 'c'}, 'first')
+        second = self.commit({'plain.txt': 'd'}, 'second')
+        self.git('-C', 'work', 'push', '-q', '../repo.git', 'HEAD:refs/heads/master')
+
+        last_commits = self.repo.get_last_commits('master', '', ['sp dir', 'plain.txt'])
+        self.assertEqual(last_commits['sp dir'].sha1_hash, first)
+        self.assertEqual(last_commits['plain.txt'].sha1_hash, second)
+
+        last_commits = self.repo.get_last_commits('master', 'sp dir', ['sp dir/t\tab.txt', 'sp dir/q"uote\\.txt'])
+        self.assertEqual({path: commit.sha1_hash for path, commit in last_commits.items()},
+                            {'sp dir/t\tab.txt': first, 'sp dir/q"uote\\.txt': first})
@@ -2,7 +2,7 @@ from django.conf.urls import include, url
 
 from repository.views import get_info_refs, service_rpc, new_repository, \
                                 view_repository, repository_settings, repository_area51,    \
-                                repository_branches, repository_commits, repository_graphs
+                                repository_branches, repository_commits, repository_graphs, repository_raw
 
 
 urlpatterns = [
@@ -16,7 +16,8 @@ urlpatterns = [
     url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/branches$', repository_branches, name='repository_branches'),
     url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/commits$', repository_commits, name='repository_commits'),
     url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/graphs$', repository_graphs, name='repository_graphs'),
-    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/tree/(?P<rev>[-\w]+)/*', view_repository, name='view_repository'),
-    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/blob/(?P<rev>[-\w]+)/*', view_repository, name='view_repository'),
+    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/tree/(?P<rev>[-\w.]+)/*', view_repository, name='view_repository'),
+    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/blob/(?P<rev>[-\w.]+)/*', view_repository, name='view_repository'),
+    url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git/raw/(?P<rev>[-\w.]+)/(?P<path>.+)$', repository_raw, name='repository_raw'),
     url(r'(?P<username>\w+)/(?P<repository>[-\w]+).git$', view_repository, name='view_repository'),
 ]
@@ -1,22 +1,31 @@
+import mimetypes
+
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
-
-from repository.decorators import require_existing_repo, require_existing_rev, require_access, require_owner_access
-from git.object import GitTree, GitBlob, GIT_BLOB_OBJECT, GIT_TREE_OBJECT, GIT_VALID_OBJECT_KINDS
+from django.views.decorators.vary import vary_on_headers
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_http_methods, etag
+
+from repository.decorators import require_existing_repo, require_existing_rev, require_access, require_owner_access, \
+                                        get_requested_repo
+from git.object import GitTree, GitBlob, GIT_BLOB_OBJECT, GIT_TREE_OBJECT, GIT_VALID_OBJECT_KINDS, GIT_BINARY_CHECK_SIZE, \
+                            is_binary
 from repository.forms import RepositoryCreationForm, RepositoryArea51Form
 from git.action import GIT_ACTION_ADVERTISEMENT, GIT_ACTION_RESULT
 from git.decorators import git_access_required
 from utils.urlparser import partition_url
+from utils.http import parse_range_header, content_range, make_etag
 from git.statistics import GitStatistics
-from repository.models import Repository
-from git.http import GitResponse
+from git.readme import find_readme, render_readme
+from git.http import GitResponse, GitStreamingResponse, read_request_body, get_request_protocol
 from git.repo import Repo
 
+COMMITS_PAGE_SIZE = 30
+
 
 @require_http_methods(['GET'])
 @require_existing_repo
@@ -28,7 +37,7 @@ def get_info_refs(request, username, repository):
 
     requested_repo = Repo(Repo.get_repository_location(username, repository))
     response = GitResponse(service=request.GET['service'], action=GIT_ACTION_ADVERTISEMENT,
-                    repository=requested_repo, data=None)
+                    repository=requested_repo, data=None, protocol=get_request_protocol(request))
 
     return response.get_http_info_refs()
 
@@ -43,11 +52,12 @@ def service_rpc(request, username, repository):
             for the given username and repository.
         Decorator 'csrf_exempt' is used because git POST requests does not provide csrf cookies and
             therefore validation cannot be done.
+        Request body is streamed into git service in chunks instead of being read as a whole.
     """
 
     requested_repo = Repo(Repo.get_repository_location(username, repository))
-    response = GitResponse(service=request.path_info.split('/')[-1], action=GIT_ACTION_RESULT,
-                    repository=requested_repo, data=request.body)
+    response = GitStreamingResponse(service=request.path_info.split('/')[-1], action=GIT_ACTION_RESULT,
+                    repository=requested_repo, data=read_request_body(request), protocol=get_request_protocol(request))
 
     return response.get_http_service_rpc()
 
@@ -79,7 +89,7 @@ def repository_area51(request, username, repository):
         View for deleting a repository of user's deposit.
     """
 
-    repository = Repository.objects.get(owner=request.user, name=repository)
+    repository = get_requested_repo(request, username, repository)
     form = RepositoryArea51Form(data=request.POST, repository=repository)
     if form.is_valid():
         form.save()
@@ -88,13 +98,41 @@ def repository_area51(request, username, repository):
         raise Http404()
 
 
+def _get_browse_etag(request, username, repository, rev='HEAD'):
+    """
+        Returns ETag of a browse page, made of SHA-1 hashes of requested object (tree or blob), it's
+            revision's commit (latest commits of it's entries) and HEAD commit (repository's latest
+            status, whose age is rendered by client), along with requesting user (sidebar and options)
+            and whether it's a pjax request. All of it is resolved from refs and object ids, so unchanged
+            pages are answered without running git commands or rendering templates. None is returned
+            (no ETag) for missing objects.
+    """
+
+    repo = Repo(Repo.get_repository_location(username, repository))
+    path = '/'.join(partition_url(request.path_info)[4:])
+    obj, commit = repo.get_object_info('{0}:{1}'.format(rev, path)), repo.get_object_info('{0}^{{commit}}'.format(rev))
+    if obj is None or commit is None:
+        return None
+
+    head = repo.get_object_info('HEAD')
+    profile = getattr(request.user, 'profile', None)
+    user = None
+    if request.user.is_authenticated:
+        user = (request.user.pk, request.user.username, profile and profile.name, profile and str(profile.avatar))
+    return make_etag(obj[0], commit[0], head and head[0], user, bool(request.META.get('HTTP_X_PJAX')))
+
+
 @require_http_methods(['GET'])
+@vary_on_headers('X-PJAX')
+@cache_control(private=True, no_cache=True)
 @require_existing_repo
 @require_access
 @require_existing_rev
+@etag(_get_browse_etag)
 def view_repository(request, username, repository, rev='HEAD'):
     """
         View for showing repository objects inside the given revision (either trees or blobs).
+            README of a tree is rendered along with it's contents.
     """
 
     requested_repo = Repo(Repo.get_repository_location(username, repository))
@@ -102,9 +140,77 @@ def view_repository(request, username, repository, rev='HEAD'):
     if objects is None:
         raise Http404()
     else:
+        readme = render_readme(find_readme(objects)) if isinstance(objects, list) else None
         return render(request, 'repository/repo-pjax.html',
                     {'template': 'browse', 'repo_owner': username, 'repo_name': repository,
-                        'repo_lsmsg': requested_repo.get_latest_status, 'rev': rev, 'objects': objects})
+                        'repo_lsmsg': requested_repo.get_latest_status, 'rev': rev, 'objects': objects,
+                        'readme': readme})
+
+
+def _get_raw_etag(request, username, repository, rev, path):
+    """
+        Returns ETag of a raw blob, which is it's SHA-1 hash since it identifies it's content.
+    """
+
+    info = GitBlob(repo=Repo(Repo.get_repository_location(username, repository)), path=path, rev=rev).get_info()
+    return None if info is None else info[0]
+
+
+@require_http_methods(['GET', 'HEAD'])
+@require_existing_repo
+@require_access
+@require_existing_rev
+@etag(_get_raw_etag)
+def repository_raw(request, username, repository, rev, path):
+    """
+        View for raw content of a blob. Content is streamed in chunks from git, so large files
+            don't need to fit in memory. Single byte ranges ('Range' header, honored only if
+            'If-Range' matches blob's ETag) and conditional requests by ETag are supported.
+        Text blobs are sent as plain text and binary ones (detected by their beginning) as downloads,
+            except for images.
+    """
+
+    blob = GitBlob(repo=Repo(Repo.get_repository_location(username, repository)), path=path, rev=rev)
+    info = blob.get_info()
+    if info is None:
+        raise Http404()
+    sha1_hash, size = info
+
+    byte_range = None
+    if request.META.get('HTTP_IF_RANGE', '"{0}"'.format(sha1_hash)) == '"{0}"'.format(sha1_hash):
+        try:
+            byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = content_range(None, None, size)
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    content = [] if request.method == 'HEAD' else blob.stream(start, end)
+    response = StreamingHttpResponse(content, status=200 if byte_range is None else 206,
+                                        content_type=_get_raw_content_type(blob, path))
+    response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Content-Security-Policy'] = 'sandbox'
+    if byte_range is not None:
+        response['Content-Range'] = content_range(start, end, size)
+    return response
+
+
+def _get_raw_content_type(blob, path):
+    """
+        Returns content type of a raw blob by checking it's beginning for binary content, which is read
+            natively without running git.
+    """
+
+    if not is_binary(blob.get_head(GIT_BINARY_CHECK_SIZE)):
+        return 'text/plain; charset=utf-8'
+
+    content_type = mimetypes.guess_type(path)[0]
+    if content_type is not None and content_type.startswith('image/') and content_type != 'image/svg+xml':
+        return content_type
+    return 'application/octet-stream'
 
 
 @require_http_methods(['GET'])
@@ -132,10 +238,18 @@ def repository_commits(request, username, repository):
         View for viewing commits for repository.
     """
 
+    page = _parse_page_number(request.GET.get('page'))
     requested_repo = Repo(Repo.get_repository_location(username, repository))
-    commits = {branch:requested_repo.get_commits(branch) for branch in requested_repo.get_branches()}
+
+    # One more commit than page size is requested to see if there's a next page.
+    commits = {branch: requested_repo.get_commits(branch, skip=(page - 1) * COMMITS_PAGE_SIZE, limit=COMMITS_PAGE_SIZE + 1)
+                    for branch in requested_repo.get_branches()}
+    has_next = any(len(branch_commits) > COMMITS_PAGE_SIZE for branch_commits in commits.values())
+    commits = {branch: branch_commits[:COMMITS_PAGE_SIZE] for branch, branch_commits in commits.items()}
+
     return render(request, 'repository/repo-pjax.html',
-                    {'template': 'commits', 'repo_owner': username, 'repo_name': repository, 'commits': commits})
+                    {'template': 'commits', 'repo_owner': username, 'repo_name': repository, 'commits': commits,
+                        'page': page, 'has_next': has_next})
 
 
 @require_http_methods(['GET'])
@@ -164,7 +278,7 @@ def repository_settings(request, username, repository):
         View for changing/viewing repository settings.
     """
 
-    repo = Repository.objects.get(owner=request.user, name=repository)
+    repo = get_requested_repo(request, username, repository)
     if request.method == 'POST':
         form = RepositoryCreationForm(data=request.POST, user=request.user, instance=repo, edit=True)
         if form.is_valid():
@@ -177,6 +291,17 @@ def repository_settings(request, username, repository):
                     {'repo': repo, 'repo_owner': username, 'repo_name': repository, 'form': form})
 
 
+def _parse_page_number(page):
+    """
+        Returns page number from the given query string value. Invalid or missing values point to first page.
+    """
+
+    try:
+        return max(int(page), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
 def _parse_repo_url(request_path, repository, rev):
     """
         Parses url for viewing repository. Splits request url on '/' and checks parts
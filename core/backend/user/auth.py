@@ -1,19 +1,65 @@
+import hmac
 import base64
+import hashlib
 
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.utils.crypto import constant_time_compare
+
+
+def _get_credentials_cache_key(username, password):
+    """
+        Returns cache key of the given credentials. Credentials are never kept in cache,
+            only their HMAC digest (keyed by project's secret key) is used as key.
+    """
+
+    digest = hmac.new(settings.SECRET_KEY.encode('utf8'), '{0}:{1}'.format(username, password).encode('utf8'),
+                        hashlib.sha256).hexdigest()
+    return 'git-auth:{0}'.format(digest)
+
+
+def _get_cached_user(key):
+    """
+        Returns user of previously verified credentials or None if credentials are not cached or
+            they are not valid anymore (user is deleted, deactivated or it's password is changed).
+    """
+
+    cached = cache.get(key)
+    if cached is None:
+        return None
+
+    user_id, password_hash = cached
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        user = None
+
+    if user is None or not user.is_active or not constant_time_compare(user.password, password_hash):
+        cache.delete(key)
+        return None
+    return user
 
 
 def base_auth(authorization_header):
     """
         Authenticates user based on "HTTP_AUTHORIZATION" header values for
             HTTP basic authorization purposes.
+        Verified credentials are cached for settings.GIT_AUTH_CACHE_TIMEOUT seconds, so repeated
+            requests of git clients don't go through password hashing each time.
     """
 
     authmeth, auth = authorization_header.split(' ', 1)
     if authmeth.lower() == 'basic':
         auth = base64.b64decode(auth.strip()).decode('utf8')
         username, password = auth.split(':', 1)
-        user = authenticate(username=username, password=password)
+        key = _get_credentials_cache_key(username, password)
+        user = _get_cached_user(key)
+        if user is None:
+            user = authenticate(username=username, password=password)
+            if user:
+                cache.set(key, (user.pk, user.password), settings.GIT_AUTH_CACHE_TIMEOUT)
         return user
     else:
         return None
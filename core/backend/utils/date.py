@@ -1,47 +1,19 @@
 from dateutil import tz
 from datetime import datetime
-import dateutil.parser as tparser
 
 
-def time_to_utc(time):
+def datetime_to_utc(value):
     """
-        Returns 'UTC' conversion of the given time in "ISO-8601 like" format.
-            'time' is a string data type.
+        Returns 'UTC' conversion of the given timezone aware datetime in "ISO-8601 like" format.
     """
 
-    utc_zone = tz.tzutc()
-    dt = tparser.parse(time)
-    in_utc = dt.astimezone(utc_zone).strftime("%Y-%m-%dT%H:%M:%S%z")
-    return in_utc
+    return value.astimezone(tz.tzutc()).strftime("%Y-%m-%dT%H:%M:%S%z")
 
 
-def get_year(utc_timestamp):
+def timestamp_to_utc(timestamp):
     """
-        Returns year of the given utc timestamp.
+        Returns 'UTC' conversion of the given unix timestamp in "ISO-8601 like" format,
+            same as the output of 'datetime_to_utc'.
     """
 
-    return tparser.parse(utc_timestamp).year
-
-
-def get_month(utc_timestamp):
-    """
-        Returns month of the given utc timestamp.
-    """
-
-    return tparser.parse(utc_timestamp).month
-
-
-def get_weeknumber(utc_timestamp):
-    """
-        Returns week number of the given utc timestamp.
-    """
-
-    return tparser.parse(utc_timestamp).isocalendar()[1]
-
-
-def get_weekday(utc_timestamp):
-    """
-        Returns week day of the given utc timestamp.
-    """
-
-    return tparser.parse(utc_timestamp).isocalendar()[2]
+    return datetime.fromtimestamp(int(timestamp), tz.tzutc()).strftime("%Y-%m-%dT%H:%M:%S%z")
@@ -0,0 +1,50 @@
+import re
+import hashlib
+
+HTTP_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range_header(header, size):
+    """
+        Returns (start, end) byte offsets (inclusive) requested by a 'Range' header for a content
+            of the given size, or None if whole content should be sent (no header, a malformed one
+            or multiple ranges, which are allowed to be ignored).
+        Raises ValueError if requested range is not satisfiable.
+
+        e.g.
+            'bytes=0-499' for first 500 bytes, 'bytes=500-' from 500th byte and 'bytes=-500' for last 500 bytes.
+    """
+
+    match = HTTP_RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None or match.group(1) == match.group(2) == '':
+        return None
+
+    if match.group(1) == '':    # suffix range.
+        length = int(match.group(2))
+        if length == 0 or size == 0: raise ValueError('Range is not satisfiable.')
+        return max(size - length, 0), size - 1
+
+    start = int(match.group(1))
+    end = size - 1 if match.group(2) == '' else min(int(match.group(2)), size - 1)
+    if start >= size: raise ValueError('Range is not satisfiable.')
+    if start > end:     # invalid range header, it's ignored.
+        return None
+    return start, end
+
+
+def content_range(start, end, size):
+    """
+        Returns value of 'Content-Range' header for the given byte range (None for an unsatisfiable one).
+    """
+
+    if start is None:
+        return 'bytes */{0}'.format(size)
+    return 'bytes {0}-{1}/{2}'.format(start, end, size)
+
+
+def make_etag(*parts):
+    """
+        Returns an ETag value (unquoted) identifying a response by all the given parts it's made of.
+    """
+
+    return hashlib.sha1('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
@@ -1,16 +1,17 @@
-import os, shlex, shutil, logging
-from subprocess import PIPE, run
+import os, shlex, shutil, logging, tempfile, threading
+from subprocess import DEVNULL, PIPE, Popen, run
+
+COMMAND_OUTPUT_CHUNK_SIZE = 64 * 1024
 
 logger = logging.getLogger('django')
 
 
-def run_command(cmd, data, location, chw):
+def _locate_command(cmd, location, chw):
     """
-        Runs command specified in 'cmd' and provides the input with the given data.
-        Also if there is a location it will be appended to the end of command.
+        Returns command and it's working directory according to the given location.
+            If 'chw' is True command is run inside location, else location is appended to the end of command.
     """
 
-    output = None
     cwd = os.getcwd()
 
     if location is not None and chw is True:
@@ -18,7 +19,32 @@ def run_command(cmd, data, location, chw):
     elif location is not None and chw is False:
         cmd = '{0} {1}'.format(cmd, location)
 
-    result = run(shlex.split(cmd), input=data, stdout=PIPE, stderr=PIPE, cwd=cwd)
+    return cmd, cwd
+
+
+def _get_command_env(env):
+    """
+        Returns environment of a command with the given extra variables added to
+            current environment, or None (inherit current environment) if there are none.
+    """
+
+    if not env:
+        return None
+    command_env = dict(os.environ)
+    command_env.update(env)
+    return command_env
+
+
+def run_command(cmd, data, location, chw, env=None):
+    """
+        Runs command specified in 'cmd' and provides the input with the given data.
+        Also if there is a location it will be appended to the end of command.
+        Extra environment variables of command can be given in 'env' dict.
+    """
+
+    cmd, cwd = _locate_command(cmd, location, chw)
+
+    result = run(shlex.split(cmd), input=data, stdout=PIPE, stderr=PIPE, cwd=cwd, env=_get_command_env(env))
 
     if result.stderr != b'':
         logger.info('RUN_COMMAND -> ERR ({})'.format(result.stderr))
@@ -29,6 +55,116 @@ def run_command(cmd, data, location, chw):
         return result.stdout
 
 
+def execute_command(cmd, location, chw, env=None):
+    """
+        Runs command specified in 'cmd' just like 'run_command' but without any input and
+            only for it's effects. Returns true if command exits successfully.
+    """
+
+    cmd, cwd = _locate_command(cmd, location, chw)
+
+    result = run(shlex.split(cmd), stdin=DEVNULL, stdout=DEVNULL, stderr=PIPE, cwd=cwd, env=_get_command_env(env))
+
+    if result.returncode != 0:
+        logger.error('EXECUTE_COMMAND -> ERR ({0}: {1})'.format(result.returncode, result.stderr))
+
+    return result.returncode == 0
+
+
+def stream_command(cmd, data, location, chw, env=None):
+    """
+        Runs command specified in 'cmd' just like 'run_command' but instead of buffering
+            the whole output, returns a generator which yields output in chunks as soon
+            as command produces them. Command is started on the first iteration, so a
+            generator which is closed (or dropped) before that never leaves a process behind.
+            Once output is exhausted generator returns command's exit status (e.g. to 'yield from').
+        Input data can be a bytes object or an iterable of bytes chunks. It's written to
+            command in a separate thread so that reading and writing won't block each other.
+    """
+
+    cmd, cwd = _locate_command(cmd, location, chw)
+    return _read_command(shlex.split(cmd), data, cwd, _get_command_env(env))
+
+
+def _feed_command(stdin, data):
+    """
+        Writes the given data (either bytes or an iterable of bytes chunks) to command's input.
+    """
+
+    try:
+        for chunk in [data] if isinstance(data, bytes) else data:
+            stdin.write(chunk)
+    except BrokenPipeError:  # command exited before consuming all of it's input.
+        pass
+    except BaseException as e:
+        logger.error('STREAM_COMMAND -> INPUT ERR ({})'.format(e))
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _read_command(args, data, cwd, env):
+    """
+        Starts the given command and yields it's output in chunks of at most COMMAND_OUTPUT_CHUNK_SIZE bytes.
+            If consumer stops early (e.g. client disconnects) process is killed. Errors of a failed command
+            are logged as errors, other output of it's stderr only as info.
+    """
+
+    errors = tempfile.TemporaryFile()
+    try:
+        process = Popen(args, stdin=DEVNULL if data is None else PIPE, stdout=PIPE, stderr=errors, cwd=cwd, env=env)
+    except BaseException:
+        errors.close()
+        raise
+
+    feeder = None
+    if data is not None:
+        feeder = threading.Thread(target=_feed_command, args=(process.stdin, data), daemon=True)
+        feeder.start()
+
+    completed = False
+    try:
+        for chunk in iter(lambda: process.stdout.read1(COMMAND_OUTPUT_CHUNK_SIZE), b''):
+            yield chunk
+        completed = True
+    finally:
+        if not completed:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        if feeder is not None:
+            feeder.join()
+
+        errors.seek(0)
+        stderr = errors.read()
+        errors.close()
+        if completed and process.returncode != 0:
+            logger.error('STREAM_COMMAND -> ERR ({0}: {1})'.format(process.returncode, stderr))
+        elif stderr != b'':
+            logger.info('STREAM_COMMAND -> ERR ({})'.format(stderr))
+
+    return process.returncode
+
+
+def iter_lines(chunks, separator=b'\n'):
+    """
+        Yields lines (without their line endings) of the given output chunks.
+            Lines split between two chunks are joined back together. Lines can be separated
+            by another separator too, e.g. NUL for output of git commands run with '-z'.
+    """
+
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).split(separator)
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending != b'':
+        yield pending
+
+
 def remove_tree(path):
     """
         Removes a folder and it's whole tree from server storage.
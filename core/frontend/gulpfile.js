@@ -58,7 +58,6 @@ gulp.task('libs', function () {
             '../../node_modules/highlightjs/highlight.pack.min.js',
             '../../node_modules/nprogress/nprogress.js',
             '../../node_modules/moment/min/moment.min.js',
-            '../../node_modules/marked/marked.min.js',
             '../../node_modules/chart.js/dist/Chart.min.js'
         ])
         .pipe(concat('djacket-libs.js'))
@@ -5,45 +5,6 @@ function highlight_codes () {
 }
 
 
-function setup_markdown () {
-    var markdowns = [];
-
-    marked.setOptions({
-      renderer: new marked.Renderer(),
-      gfm: true,
-      tables: true,
-      breaks: true,
-      pedantic: false,
-      sanitize: true,
-      smartLists: true,
-      smartypants: false
-    });
-
-    $('table#repo-content tbody tr td.repo-obj-name[type="blob"] a').each(function () {
-        if ($(this).text().trim() == 'README.md' || $(this).text().trim() == 'README.rst') {
-            markdowns.push($(this).attr('href'));
-        }
-    });
-
-    if (markdowns.length > 0) {
-        var file_name = markdowns[0].split('/')[markdowns[0].split('/').length-1];
-        $.ajax({
-            url: '/api' + markdowns[0].replace('.git/blob/', '.git/readme/'),
-            type: 'get',
-            success: function(data) {
-                $('h2.markdown-title').html('<i class="fa fa-book"></i> ' + file_name);
-                $('.markdown-preview .markdown-title').css('display', 'block');
-                $('.markdown-preview .arrow-down').css('display', 'block');
-                $('.markdown-preview .markdown-body').html(marked(data));
-            },
-            failure: function(data) {
-                console.error('djacket > failed to get README file.');
-            }
-        });
-    }
-}
-
-
 function process_dates () {
     $('.moment-date').each(function () {
         if (!$(this).hasClass('moment-dated')) {
@@ -194,7 +155,6 @@ function get_datasets () {
 function setup_page () {
     highlight_codes();
     process_dates();
-    setup_markdown();
     setup_file_icons();
     get_datasets();
 }
@@ -199,7 +199,7 @@ function ask_for_paths {
 # Stops the production Docker containers.
 function stop {
     alert_if_not_installed;
-    docker stop djacket_web djacket_upstream djacket_prod_base;
+    docker stop djacket_web djacket_upstream djacket_git_upstream djacket_maintenance djacket_prod_base;
 }
 
 # Starts development Docker containers.
@@ -242,7 +242,7 @@ function rm_dev_image {
 
 # Removes production Docker containers.
 function rm_prod {
-    docker rm djacket_web djacket_upstream djacket_prod_base;
+    docker rm djacket_web djacket_upstream djacket_git_upstream djacket_maintenance djacket_prod_base;
 }
 
 # Removes production Docker image.